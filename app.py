@@ -1,13 +1,20 @@
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for
+from flask import Flask, render_template, request, send_file, flash, redirect, url_for, jsonify
 import os
 import csv as import_csv
 import pandas as pd
 from secure_reconcile import ReconciliationEngine
+from write_coordinator import WriteCoordinator
+from columnar_catalog import MappedCatalog
+from upload_reader import base_name, upload_extension
+from result_store import ResultStore
+from migrate_db import DB_FILE, utc_now
 import tempfile
 import uuid
 from flask import Flask
 app = Flask(__name__)
 app.secret_key = 'super_secure_secret_key'
+# Parse uploads from the request stream instead of saving them to uploads/ first
+app.config['PARSE_UPLOAD_STREAM'] = os.environ.get('PARSE_UPLOAD_STREAM', '0') == '1'
 
 UPLOAD_FOLDER = 'uploads'
 RESULTS_FOLDER = 'results'
@@ -15,7 +22,28 @@ RESULTS_FOLDER = 'results'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
 
-engine = ReconciliationEngine()
+# All DB writes from request threads go through one coordinator so
+# concurrent uploads are queued and group-committed instead of racing
+# for the SQLite write lock.
+coordinator = WriteCoordinator(DB_FILE)
+engine = ReconciliationEngine(db_path=coordinator.db_path, coordinator=coordinator)
+results = ResultStore(RESULTS_FOLDER, db_path=engine.db.db_path)
+
+# Shared, memory-mapped catalog; re-exported in the background after each group commit.
+catalog = None
+
+def get_catalog():
+    global catalog
+    if catalog is None:
+        if not os.path.exists(engine.catalog_path):
+            engine.refresh_catalog()
+            engine.catalog_exporter.flush()
+        catalog = MappedCatalog(engine.catalog_path)
+    # Picks up writes made outside this process (CLI runs); served from
+    # the current file until the background export lands
+    engine.catalog_exporter.ensure_fresh()
+    catalog.refresh()
+    return catalog
 
 @app.route('/', methods=['GET'])
 def index():
@@ -32,16 +60,25 @@ def upload_file():
         flash('No selected file')
         return redirect(request.url)
 
+    if not upload_extension(file.filename):
+        flash('Error: Unsupported file format')
+        return redirect(url_for('index'))
+
     if file:
-        # Save temp file
-        temp_filename = f"TEMP_{uuid.uuid4()}_{file.filename}"
-        temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
-        file.save(temp_filepath)
-        
+        upload_id = str(uuid.uuid4())
+        temp_filepath = None
+
         try:
             # Process the file
-            
-            enriched_df, summary = engine.process_file(temp_filepath)
+            if app.config['PARSE_UPLOAD_STREAM']:
+                # Parse straight from the request stream, no copy in uploads/
+                enriched_df, summary = engine.process_file(file.stream, upload_id=upload_id, filename=file.filename)
+            else:
+                # Save temp file
+                temp_filename = f"TEMP_{upload_id}_{file.filename}"
+                temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
+                file.save(temp_filepath)
+                enriched_df, summary = engine.process_file(temp_filepath, upload_id=upload_id)
             
             if enriched_df is None and 'error' in summary:
                 flash(f"Error: {summary['error']}")
@@ -51,27 +88,44 @@ def upload_file():
                 flash(f"Critical Error: {summary['error_fatal']}")
                 return redirect(url_for('index'))
                 
-            # Generate Output Filename
-            # reconciled_<original_filename>_<timestamp>.xlsx
-            import datetime
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            original_base = os.path.splitext(file.filename)[0]
-            output_filename = f"reconciled_{original_base}_{timestamp}.xlsx"
-            output_path = os.path.join(RESULTS_FOLDER, output_filename)
+            # Save Enriched DataFrame as reconciled_<original_filename>_<timestamp>_<id>.xlsx
+            output_path = results.save(upload_id, base_name(file.filename), enriched_df)
             
-            # Save Enriched DataFrame
-            enriched_df.to_excel(output_path, index=False)
-            
-            return send_file(output_path, as_attachment=True)
+            # send_file resolves relative paths against the app root, not the CWD
+            response = send_file(os.path.abspath(output_path), as_attachment=True)
+            response.headers['X-Upload-Id'] = upload_id
+            return response
             
         except Exception as e:
              flash(f"System Error: {str(e)}")
              return redirect(url_for('index'))
         finally:
             # Clean up temp file
-            if os.path.exists(temp_filepath):
+            if temp_filepath and os.path.exists(temp_filepath):
                 os.remove(temp_filepath)
 
+@app.route('/results/<upload_id>', methods=['GET'])
+def download_result(upload_id):
+    path = results.get(upload_id)
+    if path is None:
+        return jsonify({"error": f"No result for upload {upload_id} (unknown or expired)"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/summary', methods=['GET'])
+def summary():
+    description = request.args.get('category')
+    return jsonify({
+        "totals": engine.aggregates.get_totals(),
+        "categories": engine.aggregates.get_category_summary(description)
+    })
+
+@app.route('/product/<product_code>', methods=['GET'])
+def product(product_code):
+    record = get_catalog().lookup(product_code)
+    if record is None:
+        return jsonify({"error": f"Product {product_code} not found"}), 404
+    return jsonify(record)
+
 @app.route('/add_product', methods=['POST'])
 def add_product():
     try:
@@ -101,25 +155,19 @@ def add_product():
             writer.writerow(new_row)
             
         # 2. Update SQLite
-        import sqlite3
-        import datetime
-        
-        conn = sqlite3.connect('enterprise_data.db')
-        cursor = conn.cursor()
-        
-        # Upsert logic (Replace or Insert)
-        cursor.execute("""
-            INSERT INTO master_data (product_code, description, price, quantity, final_amount, last_updated_at)
-            VALUES (?, ?, ?, ?, 0, ?)
-            ON CONFLICT(product_code) DO UPDATE SET
-                description = excluded.description,
-                price = excluded.price,
-                quantity = excluded.quantity,
-                last_updated_at = excluded.last_updated_at
-        """, (p_code, category, float(price), int(quantity), datetime.datetime.now()))
+        def upsert(conn):
+            # Upsert logic (Replace or Insert)
+            conn.execute("""
+                INSERT INTO master_data (product_code, description, price, quantity, final_amount, last_updated_at)
+                VALUES (?, ?, ?, ?, 0, ?)
+                ON CONFLICT(product_code) DO UPDATE SET
+                    description = excluded.description,
+                    price = excluded.price,
+                    quantity = excluded.quantity,
+                    last_updated_at = excluded.last_updated_at
+            """, (p_code, category, float(price), int(quantity), utc_now()))
         
-        conn.commit()
-        conn.close()
+        coordinator.submit(f"add_product:{uuid.uuid4()}", {p_code}, upsert).wait()
         
         flash(f"Success: Product {p_code} added/updated!")
         return redirect(url_for('index'))
@@ -0,0 +1,111 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+NGRAM = 3
+MIN_SUGGESTION_SCORE = 0.5
+# Trigrams shared by more codes than this (e.g. "000") say little about
+# identity and would make every lookup touch most of the catalog.
+MAX_POSTING_SIZE = 50000
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+
+def normalize_key(code) -> str:
+    """
+    Case- and punctuation-insensitive form of a product code: "sc-8000 " -> "SC8000".
+    """
+    return _NON_ALNUM.sub('', str(code).upper())
+
+def _grams(key: str) -> List[str]:
+    padded = f"#{key}#"
+    if len(padded) <= NGRAM:
+        return [padded]
+    return list({padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)})
+
+class CodeMatcher:
+    """
+    Suggests catalog product codes for codes that did not match exactly.
+
+    Two precomputed indexes are used: normalized key -> codes (catches
+    "SC-8000" vs "SC8000" with score 1.0) and trigram -> code ids, so a
+    lookup only scores catalog codes sharing at least one trigram instead
+    of comparing against the whole catalog. Scores are Dice coefficients
+    over trigram sets.
+    """
+    def __init__(self, codes: Iterable[str]):
+        self.codes = np.asarray([str(c) for c in codes], dtype=object)
+
+        self._by_key: Dict[str, int] = {}
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(self.codes), dtype=np.int32)
+
+        for i, code in enumerate(self.codes):
+            key = normalize_key(code)
+            # First code wins when several normalize to the same key
+            self._by_key.setdefault(key, i)
+            grams = _grams(key)
+            gram_counts[i] = len(grams)
+            for g in grams:
+                postings[g].append(i)
+
+        self._gram_counts = gram_counts
+        self._postings = {g: np.asarray(ids, dtype=np.int64) for g, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def suggest(self, code, top_k: int = 1, min_score: float = MIN_SUGGESTION_SCORE) -> List[Tuple[str, float]]:
+        """
+        Returns up to top_k (catalog_code, score) pairs, best first.
+        """
+        key = normalize_key(code)
+        if not key:
+            return []
+
+        exact = self._by_key.get(key)
+        if exact is not None and top_k == 1:
+            return [(self.codes[exact], 1.0)]
+
+        grams = _grams(key)
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        selective = [p for p in lists if len(p) <= MAX_POSTING_SIZE]
+        if selective:
+            lists = selective
+        if not lists:
+            return []
+
+        ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        scores = 2.0 * shared / (len(grams) + self._gram_counts[ids])
+        if exact is not None:
+            scores[ids == exact] = 1.0
+
+        keep = scores >= min_score
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) == 0:
+            return []
+
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        return [(self.codes[ids[i]], round(float(scores[i]), 3)) for i in order]
+
+    def suggest_many(self, codes: Iterable, min_score: float = MIN_SUGGESTION_SCORE) -> pd.DataFrame:
+        """
+        Best suggestion per input code, as columns suggested_code and
+        suggestion_score aligned with the input order. Repeated codes are
+        only scored once.
+        """
+        codes = list(codes)
+        cache: Dict[str, Optional[Tuple[str, float]]] = {}
+        suggested, scores = [], []
+        for code in codes:
+            key = normalize_key(code)
+            if key not in cache:
+                best = self.suggest(code, top_k=1, min_score=min_score)
+                cache[key] = best[0] if best else None
+            hit = cache[key]
+            suggested.append(hit[0] if hit else None)
+            scores.append(hit[1] if hit else None)
+        return pd.DataFrame({'suggested_code': suggested, 'suggestion_score': scores})
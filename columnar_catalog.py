@@ -0,0 +1,265 @@
+import os
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from migrate_db import DB_FILE
+
+# Configuration
+CATALOG_FILE = 'catalog.npy'
+
+# Columns of master_data exported to the catalog, in file order.
+NUMERIC_FIELDS = [('price', 'f8'), ('quantity', 'i8'), ('final_amount', 'f8')]
+
+# One export at a time per process, so the newest read of master_data
+# is always the one that lands last.
+_export_lock = threading.Lock()
+
+def write_catalog(df: pd.DataFrame, path: str = CATALOG_FILE):
+    """
+    Writes df (product_code, description, price, quantity, final_amount)
+    as one structured .npy file sorted by product_code.
+
+    Strings are stored as fixed-width UTF-8 bytes so the file can be
+    memory-mapped and binary-searched as-is. Missing or non-numeric
+    prices are kept as NaN; missing quantities become 0. The file is replaced
+    atomically; readers holding the old mapping keep a consistent view.
+    """
+    codes = df['product_code'].astype(str).str.encode('utf-8').to_numpy()
+    if 'description' in df.columns:
+        descs = df['description'].fillna('').astype(str).str.encode('utf-8').to_numpy()
+    else:
+        descs = np.full(len(df), b'', dtype=object)
+
+    code_width = max((len(c) for c in codes), default=1) or 1
+    desc_width = max((len(d) for d in descs), default=1) or 1
+
+    dtype = [('product_code', f'S{code_width}'), ('description', f'S{desc_width}')] + NUMERIC_FIELDS
+    arr = np.zeros(len(df), dtype=dtype)
+    arr['product_code'] = codes
+    arr['description'] = descs
+    for name, kind in NUMERIC_FIELDS:
+        if name in df.columns:
+            values = pd.to_numeric(df[name], errors='coerce')
+            # Integer columns cannot hold NaN; missing floats stay NaN
+            arr[name] = (values.fillna(0) if kind.startswith('i') else values).to_numpy()
+
+    arr = arr[np.argsort(arr['product_code'], kind='stable')]
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, arr)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def export_catalog(db_path: str = DB_FILE, path: str = CATALOG_FILE) -> int:
+    """
+    Exports master_data to the columnar catalog file. Returns row count.
+    """
+    count, _ = _export(db_path, path)
+    return count
+
+def data_version(db_path: str = DB_FILE) -> Optional[int]:
+    """
+    Trigger-maintained counter of changes to exported master_data columns
+    (None on databases without the catalog_version table).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT data_version FROM catalog_version WHERE id = 1").fetchone()
+        return row[0] if row else None
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+def _export(db_path: str, path: str) -> Tuple[int, Optional[int]]:
+    """
+    Exports one consistent snapshot; returns (row count, data_version).
+    """
+    with _export_lock:
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute("BEGIN;")
+            df = pd.read_sql_query("""
+                SELECT product_code, description, price, quantity, final_amount
+                FROM master_data
+            """, conn)
+            try:
+                version = conn.execute("SELECT data_version FROM catalog_version WHERE id = 1").fetchone()
+            except sqlite3.OperationalError:
+                version = None
+            conn.rollback()
+        finally:
+            conn.close()
+        write_catalog(df, path)
+    return len(df), version[0] if version else None
+
+class CatalogExporter:
+    """
+    Keeps a catalog file current without making writers wait for it.
+
+    request() only marks the catalog dirty. A background thread exports
+    the latest state of master_data, once for however many requests
+    arrived meanwhile, and exits when nothing is pending (so it never
+    keeps the interpreter alive, yet a running export is not cut short).
+    ensure_fresh() catches changes made by other processes, e.g. CLI runs.
+    """
+    def __init__(self, db_path: str = DB_FILE, path: str = CATALOG_FILE):
+        self.db_path = db_path
+        self.path = path
+        self.exported_version = None
+        self._pending = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def request(self):
+        with self._cond:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="catalog-export")
+                self._thread.start()
+
+    def ensure_fresh(self):
+        """
+        Requests an export if master_data changed since the last one.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+        version = data_version(self.db_path)
+        if version is not None and version != self.exported_version:
+            self.request()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Waits until no export is pending or running. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._thread is None, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._thread = None
+                    self._cond.notify_all()
+                    return
+                self._pending = False
+            try:
+                _, self.exported_version = _export(self.db_path, self.path)
+            except Exception as e:
+                logging.error(f"Catalog export to {self.path} failed: {e}")
+
+def _optional_float(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+class MappedCatalog:
+    """
+    Read-only, memory-mapped view of a catalog file. All processes that
+    open the same file share one page-cached copy; nothing is parsed.
+    """
+    def __init__(self, path: str = CATALOG_FILE):
+        self.path = path
+        self._mtime = None
+        self._arr = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Re-maps the file if it was regenerated since the last call.
+        Returns True if a new version was loaded.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        self._arr = np.load(self.path, mmap_mode='r')
+        self._mtime = mtime
+        return True
+
+    def __len__(self):
+        return len(self._arr)
+
+    @property
+    def product_codes(self) -> np.ndarray:
+        return self._arr['product_code']
+
+    def find(self, codes: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized lookup. Returns (positions, found_mask) aligned with codes.
+        """
+        keys = np.array([str(c).encode('utf-8') for c in codes], dtype=self._arr.dtype['product_code'])
+        sorted_codes = self._arr['product_code']
+        pos = np.searchsorted(sorted_codes, keys)
+        in_range = pos < len(sorted_codes)
+        found = np.zeros(len(keys), dtype=bool)
+        found[in_range] = sorted_codes[pos[in_range]] == keys[in_range]
+        # Keys longer than the stored width are truncated by numpy; reject them.
+        width = self._arr.dtype['product_code'].itemsize
+        found &= np.array([len(str(c).encode('utf-8')) <= width for c in codes], dtype=bool)
+        return pos, found
+
+    def lookup_column(self, codes: Iterable[str], field: str = 'price') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (values, found_mask) of one numeric field for codes;
+        values are NaN where the code is not in the catalog.
+        """
+        codes = list(codes)
+        pos, found = self.find(codes)
+        values = np.full(len(codes), np.nan)
+        values[found] = self._arr[field][pos[found]]
+        return values, found
+
+    def lookup(self, product_code: str) -> Optional[Dict]:
+        pos, found = self.find([product_code])
+        if not found[0]:
+            return None
+        rec = self._arr[pos[0]]
+        return {
+            "product_code": rec['product_code'].decode('utf-8'),
+            "description": rec['description'].decode('utf-8'),
+            "price": _optional_float(rec['price']),
+            "quantity": int(rec['quantity']),
+            "final_amount": _optional_float(rec['final_amount'])
+        }
+
+    def lookup_many(self, codes: Iterable[str]) -> pd.DataFrame:
+        """
+        Returns a DataFrame of the matching catalog rows (unmatched codes omitted).
+        """
+        codes = list(codes)
+        pos, found = self.find(codes)
+        recs = self._arr[pos[found]]
+        return pd.DataFrame({
+            'product_code': [c.decode('utf-8') for c in recs['product_code']],
+            'description': [d.decode('utf-8') for d in recs['description']],
+            'price': recs['price'],
+            'quantity': recs['quantity'],
+            'final_amount': recs['final_amount']
+        })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar catalog export / lookup")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="Export master_data to the catalog file")
+    lookup_parser = sub.add_parser("lookup", help="Look up product codes in the catalog file")
+    lookup_parser.add_argument("codes", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        count = export_catalog()
+        print(f"Exported {count} products to {CATALOG_FILE}.")
+    else:
+        catalog = MappedCatalog()
+        for code in args.codes:
+            print(f"{code}: {catalog.lookup(code) or 'NOT FOUND'}")
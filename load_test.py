@@ -0,0 +1,212 @@
+import os
+import io
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import resource
+import tracemalloc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.abspath(os.path.dirname(__file__))
+SOURCE_DB = os.path.join(REPO_DIR, 'enterprise_data.db')
+SOURCE_CSV = os.path.join(REPO_DIR, 'price_database.csv')
+SEED_PRODUCTS = 1000
+
+def prepare_workspace(source_db: str) -> str:
+    """
+    Creates a throwaway working directory holding a copy of the database
+    (or a seeded one if none exists) and of price_database.csv. The app is
+    imported from inside it, so every relative path it uses lands there.
+    """
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    db_copy = os.path.join(workdir, 'enterprise_data.db')
+
+    if os.path.exists(source_db):
+        src = sqlite3.connect(source_db)
+        dst = sqlite3.connect(db_copy)
+        with dst:
+            src.backup(dst)
+        src.close()
+        dst.close()
+    else:
+        from migrate_db import ensure_schema
+        conn = sqlite3.connect(db_copy)
+        ensure_schema(conn)
+        conn.executemany(
+            "INSERT INTO master_data (product_code, description, quantity, price, final_amount) VALUES (?, ?, 0, ?, 0)",
+            [(f"LT{i:06d}", f"Category{i % 20}", float(100 + i)) for i in range(SEED_PRODUCTS)]
+        )
+        conn.commit()
+        conn.close()
+
+    if os.path.exists(SOURCE_CSV):
+        shutil.copy(SOURCE_CSV, workdir)
+    return workdir
+
+def load_product_codes() -> List[str]:
+    conn = sqlite3.connect('enterprise_data.db')
+    try:
+        return [r[0] for r in conn.execute("SELECT product_code FROM master_data")]
+    finally:
+        conn.close()
+
+def make_upload(codes: List[str], rows: int, rng: random.Random) -> bytes:
+    """
+    Builds an in-memory CSV upload: mostly known codes, ~5% unknown.
+    """
+    picked = [rng.choice(codes) if rng.random() > 0.05 else f"UNKNOWN{rng.randint(0, 99999)}" for _ in range(rows)]
+    df = pd.DataFrame({
+        'product_code': picked,
+        'quantity': [rng.randint(0, 50) for _ in range(rows)],
+        'price': [round(rng.uniform(10, 10000), 2) if rng.random() > 0.5 else None for _ in range(rows)]
+    })
+    return df.to_csv(index=False).encode('utf-8')
+
+def classify(response, flashes: List[str]) -> str:
+    """
+    Maps a response to ok / lock_timeout / error. Failures in this app
+    redirect back to the index with a flashed message.
+    """
+    if response.status_code == 200:
+        return 'ok'
+    messages = " ".join(flashes).lower()
+    if response.status_code == 302 and 'success' in messages:
+        return 'ok'
+    if 'locked' in messages or 'busy' in messages:
+        return 'lock_timeout'
+    return 'error'
+
+def run_request(app, kind: str, payload, results: List[Dict], lock: threading.Lock):
+    client = app.test_client()
+    start = time.perf_counter()
+    if kind == 'upload':
+        response = client.post('/upload', data={'file': (io.BytesIO(payload), 'loadtest.csv')},
+                               content_type='multipart/form-data')
+    else:
+        response = client.post('/add_product', data=payload)
+    elapsed = time.perf_counter() - start
+
+    with client.session_transaction() as session:
+        flashes = [m for _, m in session.get('_flashes', [])]
+    outcome = classify(response, flashes)
+
+    with lock:
+        results.append({
+            'kind': kind,
+            'latency': elapsed,
+            'outcome': outcome,
+            'message': flashes[0] if flashes and outcome != 'ok' else None
+        })
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {'p50': p50, 'p95': p95, 'p99': p99}
+
+def print_report(results: List[Dict], wall_time: float, peak_traced: int, max_rss_kb: int):
+    print("\n=== Load Test Report ===")
+    print(f"Requests:    {len(results)} in {wall_time:.2f}s ({len(results) / wall_time:.1f} req/s)")
+
+    for kind in ('upload', 'add_product', None):
+        subset = [r for r in results if kind is None or r['kind'] == kind]
+        if not subset:
+            continue
+        ok = [r['latency'] for r in subset if r['outcome'] == 'ok']
+        locks = sum(1 for r in subset if r['outcome'] == 'lock_timeout')
+        errors = sum(1 for r in subset if r['outcome'] == 'error')
+        p = percentiles([r['latency'] for r in subset])
+        label = kind or 'all'
+        print(f"\n[{label}] n={len(subset)} ok={len(ok)} lock_timeouts={locks} errors={errors}")
+        print(f"  latency ms  p50={p['p50']:.1f}  p95={p['p95']:.1f}  p99={p['p99']:.1f}")
+
+    failures = [r['message'] for r in results if r['outcome'] != 'ok' and r['message']]
+    if failures:
+        print("\nSample failures:")
+        for msg in sorted(set(failures))[:5]:
+            print(f" - {msg}")
+
+    print()
+    if peak_traced is not None:
+        print(f"Peak Python heap (tracemalloc): {peak_traced / 1e6:.1f} MB")
+    print(f"Max RSS:                        {max_rss_kb / 1024:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Flask app (in-process test client)")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--rows", type=int, default=200, help="Rows per uploaded file")
+    parser.add_argument("--upload-ratio", type=float, default=0.7, help="Fraction of requests that are /upload")
+    parser.add_argument("--db", default=SOURCE_DB, help="Database to copy into the throwaway workspace")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-error-rate", type=float, default=0.0,
+                        help="Exit non-zero if the failed fraction exceeds this (for pre-release checks)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report peak Python heap via tracemalloc (slows requests down)")
+    parser.add_argument("--keep", action="store_true", help="Keep the workspace directory for inspection")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+    workdir = prepare_workspace(args.db)
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    print(f"Workspace: {workdir}")
+
+    try:
+        import app as webapp
+        webapp.app.config['TESTING'] = True
+
+        rng = random.Random(args.seed)
+        codes = load_product_codes()
+        if not codes:
+            print("Error: database has no products to upload against.")
+            return 1
+
+        plan = []
+        for i in range(args.requests):
+            if rng.random() < args.upload_ratio:
+                plan.append(('upload', make_upload(codes, args.rows, rng)))
+            else:
+                plan.append(('add_product', {
+                    'product_code': f"LOAD{i:06d}",
+                    'category': 'LoadTest',
+                    'price': f"{rng.uniform(10, 1000):.2f}",
+                    'quantity': str(rng.randint(1, 20))
+                }))
+
+        results: List[Dict] = []
+        lock = threading.Lock()
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(run_request, webapp.app, kind, payload, results, lock) for kind, payload in plan]
+            for future in futures:
+                future.result()
+        wall_time = time.perf_counter() - start
+        peak = None
+        if args.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        webapp.coordinator.shutdown()
+        print_report(results, wall_time, peak, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+        failed = sum(1 for r in results if r['outcome'] != 'ok')
+        return 1 if results and failed / len(results) > args.max_error_rate else 0
+    finally:
+        os.chdir(original_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,19 @@ import sqlite3
 import pandas as pd
 import os
 import datetime
+from price_cleaning import clean_price_column, rejection_messages
 
 # Configuration
 CSV_FILE = 'price_database.csv'
 DB_FILE = 'enterprise_data.db'
+BUSY_TIMEOUT_SECONDS = 30
+
+def utc_now() -> datetime.datetime:
+    """
+    Current time as naive UTC, the clock of every timestamp column
+    (SQLite's CURRENT_TIMESTAMP and the price_history triggers use it too).
+    """
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
 
 def init_db():
     if os.path.exists(DB_FILE):
@@ -16,7 +25,18 @@ def init_db():
     
     # Enable Foreign Keys
     cursor.execute("PRAGMA foreign_keys = ON;")
-    
+    conn.commit()
+
+    ensure_schema(conn)
+    conn.close()
+
+def ensure_schema(conn):
+    """
+    Creates any missing tables, triggers and indexes. Safe to run against
+    an existing database; newly created aggregate tables are backfilled.
+    """
+    cursor = conn.cursor()
+
     # 1. Master Data Table
     # product_code is the PK.
     cursor.execute("""
@@ -39,9 +59,278 @@ def init_db():
         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """)
-    
+
+    # 3. Aggregate Tables
+    # Maintained by the master_data triggers below so dashboard reads are
+    # single-row lookups instead of scans over the whole catalog.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS category_summary (
+        description TEXT PRIMARY KEY,
+        product_count INTEGER NOT NULL DEFAULT 0,
+        total_quantity INTEGER NOT NULL DEFAULT 0,
+        total_final_amount DECIMAL(18, 2) NOT NULL DEFAULT 0
+    );
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS inventory_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        product_count INTEGER NOT NULL DEFAULT 0,
+        total_quantity INTEGER NOT NULL DEFAULT 0,
+        total_final_amount DECIMAL(18, 2) NOT NULL DEFAULT 0
+    );
+    """)
+    backfill = cursor.execute("SELECT count(*) FROM inventory_totals").fetchone()[0] == 0
+
+    cursor.executescript("""
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_insert_totals
+    AFTER INSERT ON master_data
+    BEGIN
+        INSERT INTO category_summary (description, product_count, total_quantity, total_final_amount)
+        VALUES (COALESCE(NEW.description, ''), 1, COALESCE(NEW.quantity, 0), COALESCE(NEW.final_amount, 0))
+        ON CONFLICT(description) DO UPDATE SET
+            product_count = product_count + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_final_amount = total_final_amount + excluded.total_final_amount;
+        UPDATE inventory_totals SET
+            product_count = product_count + 1,
+            total_quantity = total_quantity + COALESCE(NEW.quantity, 0),
+            total_final_amount = total_final_amount + COALESCE(NEW.final_amount, 0)
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_update_totals
+    AFTER UPDATE OF description, quantity, final_amount ON master_data
+    BEGIN
+        UPDATE category_summary SET
+            product_count = product_count - 1,
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+            total_final_amount = total_final_amount - COALESCE(OLD.final_amount, 0)
+        WHERE description = COALESCE(OLD.description, '');
+        INSERT INTO category_summary (description, product_count, total_quantity, total_final_amount)
+        VALUES (COALESCE(NEW.description, ''), 1, COALESCE(NEW.quantity, 0), COALESCE(NEW.final_amount, 0))
+        ON CONFLICT(description) DO UPDATE SET
+            product_count = product_count + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_final_amount = total_final_amount + excluded.total_final_amount;
+        DELETE FROM category_summary
+        WHERE description = COALESCE(OLD.description, '') AND product_count <= 0;
+        UPDATE inventory_totals SET
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0) + COALESCE(NEW.quantity, 0),
+            total_final_amount = total_final_amount - COALESCE(OLD.final_amount, 0) + COALESCE(NEW.final_amount, 0)
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_delete_totals
+    AFTER DELETE ON master_data
+    BEGIN
+        UPDATE category_summary SET
+            product_count = product_count - 1,
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+            total_final_amount = total_final_amount - COALESCE(OLD.final_amount, 0)
+        WHERE description = COALESCE(OLD.description, '');
+        DELETE FROM category_summary
+        WHERE description = COALESCE(OLD.description, '') AND product_count <= 0;
+        UPDATE inventory_totals SET
+            product_count = product_count - 1,
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+            total_final_amount = total_final_amount - COALESCE(OLD.final_amount, 0)
+        WHERE id = 1;
+    END;
+    """)
+
+    # 4. Price History
+    # One row per (product, validity interval). The open row for a product
+    # has valid_to NULL; "as of" lookups probe idx_price_history_asof.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS price_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_code TEXT NOT NULL,
+        price DECIMAL(10, 2),
+        quantity INTEGER,
+        valid_from TIMESTAMP NOT NULL,
+        valid_to TIMESTAMP
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_price_history_asof
+    ON price_history (product_code, valid_from);
+    """)
+    backfill_history = cursor.execute("SELECT count(*) FROM price_history").fetchone()[0] == 0
+
+    # History triggers from before the switch to UTC stamped local time
+    stale_triggers = cursor.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'trigger' AND name LIKE 'trg_master_data_%_history' AND sql LIKE '%localtime%'
+    """).fetchall()
+    for (name,) in stale_triggers:
+        cursor.execute(f"DROP TRIGGER {name}")
+
+    cursor.executescript("""
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_insert_history
+    AFTER INSERT ON master_data
+    BEGIN
+        INSERT INTO price_history (product_code, price, quantity, valid_from)
+        VALUES (
+            NEW.product_code, NEW.price, NEW.quantity,
+            COALESCE(NEW.last_updated_at, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        );
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_update_history
+    AFTER UPDATE OF price, quantity ON master_data
+    WHEN OLD.price IS NOT NEW.price OR OLD.quantity IS NOT NEW.quantity
+    BEGIN
+        UPDATE price_history SET valid_to = (
+            CASE WHEN NEW.last_updated_at IS NOT NULL AND NEW.last_updated_at IS NOT OLD.last_updated_at
+                 THEN NEW.last_updated_at
+                 ELSE strftime('%Y-%m-%d %H:%M:%f', 'now') END
+        )
+        WHERE product_code = OLD.product_code AND valid_to IS NULL;
+        INSERT INTO price_history (product_code, price, quantity, valid_from)
+        VALUES (
+            NEW.product_code, NEW.price, NEW.quantity,
+            CASE WHEN NEW.last_updated_at IS NOT NULL AND NEW.last_updated_at IS NOT OLD.last_updated_at
+                 THEN NEW.last_updated_at
+                 ELSE strftime('%Y-%m-%d %H:%M:%f', 'now') END
+        );
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_delete_history
+    AFTER DELETE ON master_data
+    BEGIN
+        UPDATE price_history SET valid_to = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        WHERE product_code = OLD.product_code AND valid_to IS NULL;
+    END;
+    """)
+
+    # 5. Upload Checkpoints (resumable batched reconciliation)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS upload_checkpoints (
+        upload_id TEXT PRIMARY KEY,
+        file_path TEXT,
+        total_rows INTEGER NOT NULL,
+        last_offset INTEGER NOT NULL DEFAULT 0,
+        summary_json TEXT,
+        status TEXT NOT NULL DEFAULT 'IN_PROGRESS',
+        content_hash TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(upload_checkpoints)")]
+    if 'content_hash' not in columns:
+        cursor.execute("ALTER TABLE upload_checkpoints ADD COLUMN content_hash TEXT;")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS upload_checkpoint_rows (
+        upload_id TEXT NOT NULL,
+        batch_start INTEGER NOT NULL,
+        rows_json TEXT NOT NULL,
+        PRIMARY KEY (upload_id, batch_start)
+    );
+    """)
+
+    # 6. Result File Index (results/ retention)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS result_files (
+        upload_id TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_result_files_created
+    ON result_files (created_at);
+    """)
+
+    # 7. Catalog Version
+    # version moves whenever the set of product codes changes, so in-memory
+    # indexes over the codes (the suggestion matcher) know when to rebuild;
+    # data_version moves on any change to an exported column, so the
+    # catalog file can tell it is stale after writes from another process.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0,
+        data_version INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(catalog_version)")]
+    if 'data_version' not in columns:
+        cursor.execute("ALTER TABLE catalog_version ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0;")
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);")
+    cursor.executescript("""
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_insert_version
+    AFTER INSERT ON master_data
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_update_version
+    AFTER UPDATE OF product_code ON master_data
+    WHEN OLD.product_code IS NOT NEW.product_code
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_delete_version
+    AFTER DELETE ON master_data
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_insert_data_version
+    AFTER INSERT ON master_data
+    BEGIN
+        UPDATE catalog_version SET data_version = data_version + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_update_data_version
+    AFTER UPDATE OF product_code, description, price, quantity, final_amount ON master_data
+    BEGIN
+        UPDATE catalog_version SET data_version = data_version + 1 WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_master_data_delete_data_version
+    AFTER DELETE ON master_data
+    BEGIN
+        UPDATE catalog_version SET data_version = data_version + 1 WHERE id = 1;
+    END;
+    """)
+
+    if backfill:
+        rebuild_aggregates(conn)
+    if backfill_history:
+        # Existing rows become the first version, valid from their last update
+        cursor.execute("""
+            INSERT INTO price_history (product_code, price, quantity, valid_from)
+            SELECT product_code, price, quantity,
+                   COALESCE(last_updated_at, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            FROM master_data;
+        """)
+
     conn.commit()
-    conn.close()
+
+def rebuild_aggregates(conn):
+    """
+    Recomputes category_summary and inventory_totals from master_data.
+    Only needed for backfills or to repair drift; triggers keep them current.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM category_summary;")
+    cursor.execute("""
+        INSERT INTO category_summary (description, product_count, total_quantity, total_final_amount)
+        SELECT COALESCE(description, ''), count(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(final_amount), 0)
+        FROM master_data
+        GROUP BY COALESCE(description, '');
+    """)
+    cursor.execute("DELETE FROM inventory_totals;")
+    cursor.execute("""
+        INSERT INTO inventory_totals (id, product_count, total_quantity, total_final_amount)
+        SELECT 1, count(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(final_amount), 0)
+        FROM master_data;
+    """)
+    conn.commit()
+
 def migrate_csv():
     if not os.path.exists(CSV_FILE):
         print(f"Error: {CSV_FILE} not found.")
@@ -72,19 +361,18 @@ def migrate_csv():
         print("Error: price column missing.")
         return
 
-    # Clean price (remove commas, text → numeric)
-    df_db['price'] = (
-        df['price']
-        .astype(str)
-        .str.replace(',', '', regex=False)
-        .str.extract(r'(\d+\.?\d*)')[0]
-        .fillna(0)
-        .astype(float)
-    )
+    # Clean price (separators, currency, lakh formatting → numeric)
+    prices, reasons = clean_price_column(df['price'])
+    df_db['price'] = prices.fillna(0)
+    rejected = rejection_messages(reasons, 'price')
+    if rejected:
+        print(f"Warning: {len(rejected)} price(s) could not be parsed and were set to 0:")
+        for msg in rejected[:20]:
+            print(f" - {msg}")
 
     df_db['quantity'] = 0
     df_db['final_amount'] = 0.0
-    df_db['last_updated_at'] = datetime.datetime.now()
+    df_db['last_updated_at'] = utc_now()
 
     # Deduplicate
     df_db = df_db.drop_duplicates(subset=['product_code'], keep='last')
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+# Accepted numeric text, matched against the whole (lower-cased) cell:
+#   optional sign, optional currency before or after, digits with either
+#   western (1,097,000.50) or Indian lakh (10,97,000) grouping, and an
+#   optional lakh/crore unit ("2.5 lakh", "1 cr"). Commas anywhere else
+#   ("12,50", "1,23,45") are ambiguous and leave the cell unparseable.
+NUMBER_PATTERN = (
+    r'^(?P<sign>[-+])?\s*'
+    r'(?:₹|rs\.?|inr|\$|usd|€|eur|£|gbp)?\s*'
+    r'(?P<sign2>[-+])?\s*'
+    r'(?P<num>(?:\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})*,\d{3})(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)\s*'
+    r'(?P<unit>lakhs?|lacs?|crores?|cr)?\.?\s*'
+    r'(?:₹|rs\.?|inr|\$|usd|€|eur|£|gbp|/-)?$'
+)
+
+UNIT_MULTIPLIERS = {
+    'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5,
+    'crore': 1e7, 'crores': 1e7, 'cr': 1e7
+}
+
+BLANK_TOKENS = ['', 'nan', 'none', 'null', 'n/a', 'na', '-']
+
+def _clean_numeric(series: pd.Series, allow_negative: bool, integer: bool) -> Tuple[pd.Series, pd.Series]:
+    """
+    Shared column cleaner. Returns (values, reasons): values is float64 with
+    NaN for blank or rejected cells, reasons holds a message per rejected
+    cell and None elsewhere.
+    """
+    reasons = pd.Series(None, index=series.index, dtype=object)
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.astype('float64')
+    else:
+        text = series.astype('string').str.strip().str.lower()
+        blank = text.isna() | text.isin(BLANK_TOKENS)
+
+        # Accounting style negatives: (1,200.00)
+        paren = text.str.match(r'^\(.*\)$').fillna(False).astype(bool)
+        text = text.str.replace(r'^\((.*)\)$', r'\1', regex=True)
+
+        parts = text.str.extract(NUMBER_PATTERN)
+        unparseable = parts['num'].isna() & ~blank
+
+        values = pd.to_numeric(parts['num'].str.replace(',', '', regex=False), errors='coerce').astype('float64')
+        values = values * parts['unit'].map(UNIT_MULTIPLIERS).fillna(1.0).astype('float64')
+
+        negative = paren | (parts['sign'] == '-').fillna(False) | (parts['sign2'] == '-').fillna(False)
+        values = values.where(~negative.astype(bool), -values)
+
+        reasons[unparseable] = [f"unparseable value {str(v)[:40]!r}" for v in series[unparseable]]
+
+    values = values.where(~reasons.notna(), np.nan)
+
+    # read_csv turns "inf" into a float and huge digit runs overflow
+    bad = values.notna() & ~np.isfinite(values)
+    reasons[bad] = [f"non-finite value {v}" for v in values[bad]]
+    values = values.where(~bad, np.nan)
+
+    if not allow_negative:
+        bad = values < 0
+        reasons[bad] = [f"negative value {v}" for v in values[bad]]
+        values = values.where(~bad, np.nan)
+
+    if integer:
+        bad = values.notna() & (values % 1 != 0)
+        reasons[bad] = [f"not a whole number {v}" for v in values[bad]]
+        values = values.where(~bad, np.nan)
+
+    return values, reasons
+
+def clean_price_column(series: pd.Series, allow_negative: bool = False) -> Tuple[pd.Series, pd.Series]:
+    """
+    Parses a whole price column at once (thousands separators, currency
+    symbols, lakh/crore formatting, blanks). See _clean_numeric.
+    """
+    return _clean_numeric(series, allow_negative=allow_negative, integer=False)
+
+def clean_quantity_column(series: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Like clean_price_column but quantities must be non-negative whole numbers.
+    """
+    return _clean_numeric(series, allow_negative=False, integer=True)
+
+def rejection_messages(reasons: pd.Series, column: str) -> List[str]:
+    """
+    Formats the non-empty reasons as "Row <index>: <column> rejected (...)".
+    """
+    rejected = reasons.dropna()
+    return [f"Row {idx}: {column} rejected ({reason})" for idx, reason in rejected.items()]
@@ -0,0 +1,115 @@
+import os
+import time
+import sqlite3
+import logging
+from typing import Optional
+
+import pandas as pd
+
+from migrate_db import DB_FILE, BUSY_TIMEOUT_SECONDS
+
+# Configuration
+RESULTS_FOLDER = 'results'
+RESULT_TTL_SECONDS = 7 * 24 * 3600
+MAX_RESULTS_BYTES = 1024 ** 3
+
+class ResultStore:
+    """
+    Owns the results directory. Every reconciled file is indexed by
+    upload_id in the result_files table, so retrieval and eviction never
+    list the directory. Files older than ttl_seconds are removed, and the
+    oldest files go first whenever the total size exceeds max_total_bytes.
+    """
+    def __init__(self, results_dir=RESULTS_FOLDER, db_path=DB_FILE,
+                 ttl_seconds=RESULT_TTL_SECONDS, max_total_bytes=MAX_RESULTS_BYTES):
+        self.results_dir = results_dir
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        os.makedirs(results_dir, exist_ok=True)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+
+    def save(self, upload_id: str, base_name: str, enriched_df: pd.DataFrame) -> str:
+        """
+        Writes enriched_df as reconciled_<base_name>_<timestamp>.xlsx,
+        indexes it and applies the retention policy. Returns the path.
+        """
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        file_name = f"reconciled_{base_name}_{timestamp}_{upload_id[:8]}.xlsx"
+        path = os.path.join(self.results_dir, file_name)
+        enriched_df.to_excel(path, index=False)
+
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO result_files (upload_id, file_name, size_bytes, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (upload_id, file_name, os.path.getsize(path), time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.evict(keep=upload_id)
+        return path
+
+    def get(self, upload_id: str) -> Optional[str]:
+        """
+        Path of the result for upload_id, or None if unknown or evicted.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT file_name FROM result_files WHERE upload_id = ?", (upload_id,)).fetchone()
+            if not row:
+                return None
+            path = os.path.join(self.results_dir, row[0])
+            if not os.path.exists(path):
+                conn.execute("DELETE FROM result_files WHERE upload_id = ?", (upload_id,))
+                conn.commit()
+                return None
+            return path
+        finally:
+            conn.close()
+
+    def evict(self, keep: str = None) -> int:
+        """
+        Applies TTL and size cap. keep protects a just-written result.
+        Returns the number of files removed.
+        """
+        conn = self._connect()
+        removed = 0
+        try:
+            expired = conn.execute("""
+                SELECT upload_id, file_name FROM result_files WHERE created_at < ?
+            """, (time.time() - self.ttl_seconds,)).fetchall()
+            for upload_id, file_name in expired:
+                if upload_id != keep:
+                    removed += self._remove(conn, upload_id, file_name)
+
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM result_files").fetchone()[0]
+            if total > self.max_total_bytes:
+                oldest = conn.execute("""
+                    SELECT upload_id, file_name, size_bytes FROM result_files ORDER BY created_at
+                """)
+                for upload_id, file_name, size_bytes in oldest.fetchall():
+                    if total <= self.max_total_bytes:
+                        break
+                    if upload_id == keep:
+                        continue
+                    removed += self._remove(conn, upload_id, file_name)
+                    total -= size_bytes
+            conn.commit()
+        finally:
+            conn.close()
+        if removed:
+            logging.info(f"Evicted {removed} result file(s) from {self.results_dir}")
+        return removed
+
+    def _remove(self, conn, upload_id: str, file_name: str) -> int:
+        try:
+            os.remove(os.path.join(self.results_dir, file_name))
+        except FileNotFoundError:
+            pass
+        conn.execute("DELETE FROM result_files WHERE upload_id = ?", (upload_id,))
+        return 1
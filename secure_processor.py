@@ -1,14 +1,23 @@
 import pandas as pd
 import os
+import re
+import json
+import bisect
 import getpass
 import logging
 from tabulate import tabulate
+from price_cleaning import clean_price_column
+from columnar_catalog import MappedCatalog, write_catalog
 
 # CONFIGURATION
 PRICE_DB_FILE = 'price_database.csv'
 LOG_DIR = 'logs'
 LOG_FILE = os.path.join(LOG_DIR, 'admin_actions.log')
 ADMIN_PASSWORD = 'admin123'
+PAGE_SIZE = 25
+CSV_CHUNK_ROWS = 50000
+LOG_INDEX_EVERY_LINES = 1000
+LOG_LINE_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2} [\d:,]+) - \w+ - ([A-Z_]+):')
 
 def setup_logging(log_file_path):
     log_directory = os.path.dirname(log_file_path)
@@ -34,7 +43,9 @@ def load_price_db():
         print("Error: Price database not found.")
         return None
     df = pd.read_csv(PRICE_DB_FILE)
-    
+    return normalize_price_db_columns(df)
+
+def normalize_price_db_columns(df):
     # map normalized col name -> actual col name
     col_map = {c.lower().strip(): c for c in df.columns}
     
@@ -57,6 +68,163 @@ def load_price_db():
         
     return df
 
+def get_price_page(page=1, page_size=PAGE_SIZE, prefix=None, min_price=None, max_price=None):
+    """
+    Returns (page_df, has_more) for the products matching the filters.
+    The CSV is streamed in chunks and reading stops as soon as the
+    requested page is filled, so memory stays bounded by CSV_CHUNK_ROWS.
+    """
+    if not os.path.exists(PRICE_DB_FILE):
+        print("Error: Price database not found.")
+        return None, False
+
+    to_skip = (page - 1) * page_size
+    collected = []
+    collected_rows = 0
+
+    for chunk in pd.read_csv(PRICE_DB_FILE, chunksize=CSV_CHUNK_ROWS, on_bad_lines='skip'):
+        chunk = normalize_price_db_columns(chunk)
+        mask = pd.Series(True, index=chunk.index)
+        if prefix:
+            mask &= chunk['Product_ID'].astype(str).str.startswith(prefix)
+        if min_price is not None or max_price is not None:
+            prices, _ = clean_price_column(chunk['Unit_Price'])
+            if min_price is not None:
+                mask &= prices >= min_price
+            if max_price is not None:
+                mask &= prices <= max_price
+        matches = chunk[mask]
+
+        if to_skip >= len(matches):
+            to_skip -= len(matches)
+            continue
+        matches = matches.iloc[to_skip:]
+        to_skip = 0
+
+        collected.append(matches)
+        collected_rows += len(matches)
+        # One extra row tells us whether another page exists
+        if collected_rows > page_size:
+            break
+
+    if not collected:
+        return pd.DataFrame(), False
+    result = pd.concat(collected)
+    return result.iloc[:page_size], len(result) > page_size
+
+def _load_log_index(log_file):
+    """
+    Sparse offset index for a log file: every LOG_INDEX_EVERY_LINES lines
+    the byte offset and timestamp are recorded in <log>.idx. The index is
+    extended incrementally and rebuilt if the log was truncated/rotated.
+    """
+    index_file = f"{log_file}.idx"
+    empty = {"size": 0, "since_entry": LOG_INDEX_EVERY_LINES, "entries": []}
+    index = dict(empty)
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, 'r') as f:
+                index = json.load(f)
+        except (ValueError, OSError):
+            pass
+
+    size = os.path.getsize(log_file)
+    if size < index['size']:
+        index = dict(empty, entries=[])
+    if size == index['size']:
+        return index
+
+    with open(log_file, 'rb') as f:
+        f.seek(index['size'])
+        offset = index['size']
+        since_entry = index['since_entry']
+        for raw in f:
+            if since_entry >= LOG_INDEX_EVERY_LINES:
+                m = LOG_LINE_PATTERN.match(raw.decode('utf-8', errors='replace'))
+                if m:
+                    index['entries'].append([offset, m.group(1)])
+                    since_entry = 0
+            offset += len(raw)
+            since_entry += 1
+        index['size'] = offset
+        index['since_entry'] = since_entry
+
+    try:
+        with open(index_file, 'w') as f:
+            json.dump(index, f)
+    except OSError:
+        pass
+    return index
+
+def read_log_page(start_offset=None, limit=PAGE_SIZE, date_from=None, date_to=None, action=None, log_file=None):
+    """
+    Returns (lines, next_offset). Without start_offset the read seeks, via
+    the offset index, to just before date_from. date_from/date_to are
+    inclusive prefixes of the log timestamp ("2026-10" or "2026-10-18").
+    next_offset is None once the end of the selection is reached.
+    """
+    log_file = log_file or LOG_FILE
+    if not os.path.exists(log_file):
+        return [], None
+
+    if start_offset is None:
+        start_offset = 0
+        if date_from:
+            entries = _load_log_index(log_file)['entries']
+            stamps = [e[1] for e in entries]
+            pos = bisect.bisect_left(stamps, date_from) - 1
+            if pos >= 0:
+                start_offset = entries[pos][0]
+
+    lines = []
+    with open(log_file, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for raw in f:
+            offset += len(raw)
+            line = raw.decode('utf-8', errors='replace').rstrip('\n')
+            m = LOG_LINE_PATTERN.match(line)
+            if not m:
+                if not (date_from or date_to or action):
+                    lines.append(line)
+            else:
+                stamp, line_action = m.group(1), m.group(2)
+                if date_to and stamp[:len(date_to)] > date_to:
+                    # Log is chronological: nothing further can match
+                    return lines, None
+                if date_from and stamp[:len(date_from)] < date_from:
+                    continue
+                if action and line_action != action:
+                    continue
+                lines.append(line)
+            if len(lines) >= limit:
+                return lines, offset
+    return lines, None
+
+def _prompt_number(prompt):
+    value = input(prompt).strip()
+    return float(value) if value else None
+
+def get_price_index():
+    """
+    Sorted, memory-mapped index of the price database keyed by
+    Product_Name (<PRICE_DB_FILE>.idx.npy). Rebuilt only when the CSV is
+    newer than the index; duplicate names keep the last row. Prices that
+    cannot be parsed are stored as NaN.
+    """
+    if not os.path.exists(PRICE_DB_FILE):
+        print("Error: Price database not found.")
+        return None
+
+    index_file = f"{PRICE_DB_FILE}.idx.npy"
+    if not os.path.exists(index_file) or os.stat(PRICE_DB_FILE).st_mtime_ns >= os.stat(index_file).st_mtime_ns:
+        df = load_price_db()
+        prices, _ = clean_price_column(df['Unit_Price'])
+        index_df = pd.DataFrame({'product_code': df['Product_Name'].astype(str), 'price': prices})
+        index_df = index_df.drop_duplicates(subset=['product_code'], keep='last')
+        write_catalog(index_df, index_file)
+    return MappedCatalog(index_file)
+
 def save_price_db(df):
     df.to_csv(PRICE_DB_FILE, index=False)
 
@@ -73,20 +241,25 @@ def standard_user_flow():
         return
 
     try:
-        user_df = pd.read_csv(data_file)
-        if 'Product_Name' not in user_df.columns or 'Quantity' not in user_df.columns:
+        header = pd.read_csv(data_file, nrows=0).columns
+        if 'Product_Name' not in header or 'Quantity' not in header:
             print("Error: Dataset must contain 'Product_Name' and 'Quantity' columns.")
             return
+        user_df = pd.read_csv(data_file, usecols=['Product_Name', 'Quantity'])
 
-        price_db = load_price_db()
-        if price_db is None:
+        price_index = get_price_index()
+        if price_index is None:
             return
 
-        # Merge with price database
-        merged_df = pd.merge(user_df, price_db, on='Product_Name', how='inner')
+        # Probe the index for just the user's products
+        unit_prices, found = price_index.lookup_column(user_df['Product_Name'].astype(str), 'price')
+        priced = found & pd.notna(unit_prices)
+        unmatched = user_df.loc[~found, 'Product_Name'].astype(str).unique()
+        unpriced = user_df.loc[found & ~priced, 'Product_Name'].astype(str).unique()
+        merged_df = user_df[priced].reset_index(drop=True)
         
         # Calculate totals
-        merged_df['Item_Total'] = merged_df['Unit_Price'] * merged_df['Quantity']
+        merged_df['Item_Total'] = unit_prices[priced] * merged_df['Quantity'].to_numpy()
         grand_total = merged_df['Item_Total'].sum()
 
         # Display result (excluding Unit_Price)
@@ -95,13 +268,18 @@ def standard_user_flow():
         print(tabulate(display_df, headers='keys', tablefmt='psql', floatfmt=".2f"))
         print(f"\nGrand Total: {grand_total:.2f}")
 
+        if len(unmatched):
+            print(f"\nUnmatched products ({len(unmatched)}, not in price database): {', '.join(unmatched)}")
+        if len(unpriced):
+            print(f"\nProducts without a valid price ({len(unpriced)}, excluded from total): {', '.join(unpriced)}")
+
     except Exception as e:
         print(f"Error processing file: {e}")
 
 def admin_flow():
     while True:
         print("\n--- Admin Mode ---")
-        print("1. View Full Database")
+        print("1. View Database (paged)")
         print("2. Add Product")
         print("3. Update Product Price")
         print("4. Delete Product")
@@ -111,9 +289,7 @@ def admin_flow():
         choice = input("Select an option: ").strip()
 
         if choice == '1':
-            df = load_price_db()
-            if df is not None:
-                print(tabulate(df, headers='keys', tablefmt='psql', floatfmt=".2f"))
+            view_database()
         
         elif choice == '2':
             add_product()
@@ -215,13 +391,50 @@ def delete_product():
     except ValueError:
         print("Invalid input.")
 
+def view_database():
+    try:
+        prefix = input("Product ID prefix (blank for all): ").strip() or None
+        min_price = _prompt_number("Min price (blank for none): ")
+        max_price = _prompt_number("Max price (blank for none): ")
+    except ValueError:
+        print("Invalid input.")
+        return
+
+    page = 1
+    while True:
+        df, has_more = get_price_page(page, PAGE_SIZE, prefix, min_price, max_price)
+        if df is None:
+            return
+        if df.empty:
+            print("No matching products.")
+            return
+        print(f"\n--- Products (page {page}) ---")
+        print(tabulate(df, headers='keys', tablefmt='psql', floatfmt=".2f", showindex=False))
+        if not has_more:
+            return
+        if input("Enter for next page, q to stop: ").strip().lower() == 'q':
+            return
+        page += 1
+
 def view_logs():
-    if os.path.exists(LOG_FILE):
-        print("\n--- Admin Logs ---")
-        with open(LOG_FILE, 'r') as f:
-            print(f.read())
-    else:
+    if not os.path.exists(LOG_FILE):
         print("No logs found.")
+        return
+
+    date_from = input("From date YYYY-MM-DD (blank for start): ").strip() or None
+    date_to = input("To date YYYY-MM-DD (blank for end): ").strip() or None
+    action = input("Action type e.g. ADD_PRODUCT (blank for all): ").strip().upper() or None
+
+    print("\n--- Admin Logs ---")
+    offset = None
+    while True:
+        lines, offset = read_log_page(offset, PAGE_SIZE, date_from, date_to, action)
+        for line in lines:
+            print(line)
+        if offset is None:
+            return
+        if input("Enter for next page, q to stop: ").strip().lower() == 'q':
+            return
 
 def main():
     while True:
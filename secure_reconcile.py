@@ -5,12 +5,22 @@ import datetime
 import uuid
 import logging
 import argparse
+import json
+import hashlib
 from typing import Optional, Dict, List, Tuple
 from decimal import Decimal, ROUND_HALF_UP
+from migrate_db import DB_FILE, ensure_schema, rebuild_aggregates, utc_now
+from columnar_catalog import CatalogExporter, CATALOG_FILE
+from code_matcher import CodeMatcher
+from write_coordinator import WRITE_TIMEOUT_SECONDS
+from upload_reader import read_upload, normalize_columns, UnsupportedFormatError, COLUMN_ALIASES
+from price_cleaning import clean_price_column, clean_quantity_column, rejection_messages
 
 # Configuration
-DB_FILE = 'enterprise_data.db'
 LOG_DIR = 'logs'
+MAX_PRINTED_ERRORS = 20
+
+RECONCILE_COLUMNS = set(COLUMN_ALIASES) | {'product_code', 'price', 'quantity'}
 
 # Setup Logging
 if not os.path.exists(LOG_DIR):
@@ -53,29 +63,318 @@ class AuditService:
             VALUES (?, ?)
         """, (upload_id, details))
 
+class AggregateService:
+    """
+    Read access to the trigger-maintained aggregate tables.
+    """
+    def __init__(self, db: DatabaseService):
+        self.db = db
+
+    def get_totals(self) -> Dict:
+        conn = self.db.get_connection()
+        try:
+            row = conn.execute("""
+                SELECT product_count, total_quantity, total_final_amount
+                FROM inventory_totals WHERE id = 1
+            """).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return {"product_count": 0, "total_quantity": 0, "total_final_amount": 0.0}
+        return {
+            "product_count": int(row[0]),
+            "total_quantity": int(row[1]),
+            "total_final_amount": float(row[2])
+        }
+
+    def get_category_summary(self, description: Optional[str] = None) -> List[Dict]:
+        conn = self.db.get_connection()
+        try:
+            query = """
+                SELECT description, product_count, total_quantity, total_final_amount
+                FROM category_summary
+            """
+            if description is not None:
+                rows = conn.execute(query + " WHERE description = ?", (description,)).fetchall()
+            else:
+                rows = conn.execute(query + " ORDER BY description").fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "description": r[0],
+                "product_count": int(r[1]),
+                "total_quantity": int(r[2]),
+                "total_final_amount": float(r[3])
+            }
+            for r in rows
+        ]
+
+    def rebuild(self):
+        conn = self.db.get_connection()
+        try:
+            rebuild_aggregates(conn)
+        finally:
+            conn.close()
+
+class PriceHistoryService:
+    """
+    Point-in-time lookups over the trigger-maintained price_history table.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    @staticmethod
+    def normalize_timestamp(as_of) -> str:
+        """
+        Accepts a datetime or ISO-8601 string and returns the text form
+        stored in price_history so comparisons stay lexicographic.
+        History is stamped in UTC: naive values are taken as UTC and
+        values with an offset are converted to it.
+        """
+        if isinstance(as_of, str):
+            as_of = datetime.datetime.fromisoformat(as_of.strip())
+        if as_of.tzinfo is not None:
+            as_of = as_of.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return as_of.isoformat(sep=' ')
+
+    def lookup(self, product_code: str, as_of: str) -> Optional[Tuple]:
+        """
+        Returns (price, quantity, description) valid at as_of, or None if the
+        product did not exist (or had been deleted) at that time.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT h.price, h.quantity, m.description, h.valid_to
+            FROM price_history h
+            LEFT JOIN master_data m ON m.product_code = h.product_code
+            WHERE h.product_code = ? AND h.valid_from <= ?
+            ORDER BY h.valid_from DESC, h.id DESC
+            LIMIT 1
+        """, (product_code, as_of))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        price, qty, desc, valid_to = row
+        if valid_to is not None and valid_to <= as_of:
+            return None
+        return price, qty, desc
+
+def _json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+class CheckpointService:
+    """
+    Persists progress of batched uploads in upload_checkpoints and the
+    enriched rows of every committed batch in upload_checkpoint_rows.
+    save() runs on the batch's own connection so both land atomically.
+    """
+    COUNTERS = ['matched', 'skipped', 'updated_price', 'updated_quantity']
+
+    def __init__(self, db: DatabaseService):
+        self.db = db
+
+    def load(self, upload_id: str) -> Optional[Dict]:
+        conn = self.db.get_connection()
+        try:
+            row = conn.execute("""
+                SELECT file_path, total_rows, last_offset, summary_json, status, content_hash
+                FROM upload_checkpoints WHERE upload_id = ?
+            """, (upload_id,)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        return {
+            "file_path": row[0],
+            "total_rows": row[1],
+            "last_offset": row[2],
+            "summary": json.loads(row[3]),
+            "status": row[4],
+            "content_hash": row[5]
+        }
+
+    @staticmethod
+    def content_hash(df_input: pd.DataFrame) -> str:
+        """
+        Fingerprint of the parsed upload (headers and every cell), so a
+        resume can tell it is looking at the same file.
+        """
+        digest = hashlib.sha256("\x1f".join(map(str, df_input.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df_input, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def save(self, conn, upload_id, file_path, total_rows, batch_start, batch_end, rows, summary, content_hash=None):
+        status = 'READY' if batch_end >= total_rows else 'IN_PROGRESS'
+        counters = {key: summary[key] for key in self.COUNTERS}
+        conn.execute("""
+            INSERT INTO upload_checkpoint_rows (upload_id, batch_start, rows_json)
+            VALUES (?, ?, ?)
+        """, (upload_id, batch_start, json.dumps(rows, default=_json_default)))
+        conn.execute("""
+            INSERT INTO upload_checkpoints (upload_id, file_path, total_rows, last_offset, summary_json, status,
+                                            content_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(upload_id) DO UPDATE SET
+                last_offset = excluded.last_offset,
+                summary_json = excluded.summary_json,
+                status = excluded.status,
+                updated_at = excluded.updated_at
+        """, (upload_id, file_path, total_rows, batch_end, json.dumps(counters), status, content_hash, utc_now()))
+
+    def load_rows(self, upload_id: str) -> List[Dict]:
+        conn = self.db.get_connection()
+        try:
+            batches = conn.execute("""
+                SELECT rows_json FROM upload_checkpoint_rows
+                WHERE upload_id = ? ORDER BY batch_start
+            """, (upload_id,)).fetchall()
+        finally:
+            conn.close()
+        rows = []
+        for (rows_json,) in batches:
+            rows.extend(json.loads(rows_json))
+        return rows
+
+    def complete(self, upload_id: str):
+        """
+        Marks the upload finished and drops the stored batch rows.
+        """
+        conn = self.db.get_connection()
+        try:
+            conn.execute("DELETE FROM upload_checkpoint_rows WHERE upload_id = ?", (upload_id,))
+            conn.execute("UPDATE upload_checkpoints SET status = 'COMPLETED' WHERE upload_id = ?", (upload_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+def normalize_product_code(raw_val) -> Optional[str]:
+    """
+    Canonical text form of an uploaded product code (1001.0 -> "1001").
+    Returns None for blanks.
+    """
+    p_code = None
+    if pd.api.types.is_number(raw_val) and pd.notna(raw_val):
+         if float(raw_val).is_integer():
+             p_code = str(int(raw_val))
+         else:
+             p_code = str(raw_val).strip()
+    elif pd.notna(raw_val):
+         p_code = str(raw_val).strip()
+    return p_code or None
+
 class ReconciliationEngine:
-    def __init__(self):
-        self.db = DatabaseService()
+    def __init__(self, db_path=DB_FILE, coordinator=None, catalog_path=CATALOG_FILE):
+        if coordinator is not None and os.path.abspath(coordinator.db_path) != os.path.abspath(db_path):
+            raise ValueError(f"Coordinator writes to {coordinator.db_path}, engine reads {db_path}")
+        self.db = DatabaseService(db_path)
+        self.coordinator = coordinator
+        self.catalog_path = catalog_path
+        self.catalog_exporter = CatalogExporter(db_path, catalog_path) if catalog_path else None
+        self._matcher = None
+        self._matcher_version = None
+        conn = self.db.get_connection()
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+        self.aggregates = AggregateService(self.db)
+        if coordinator is not None:
+            coordinator.on_commit = self.refresh_catalog
+
+    def refresh_catalog(self):
+        """
+        Marks the memory-mapped catalog file stale after a committed change
+        (with a coordinator, once per group commit). The export itself runs
+        on the CatalogExporter thread, so no writer waits for it; a failed
+        export is logged but never fails the upload itself.
+        """
+        if self.catalog_exporter is not None:
+            self.catalog_exporter.request()
 
-    def process_file(self, file_path: str, upload_id: str = None) -> Tuple[pd.DataFrame, Dict]:
+    def get_matcher(self) -> CodeMatcher:
+        """
+        Returns the approximate-match index over master_data product codes,
+        rebuilding it only when the trigger-maintained catalog_version moved
+        (products added, removed or renamed).
+        """
+        conn = self.db.get_connection()
+        try:
+            version = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+            if self._matcher is None or version != self._matcher_version:
+                codes = [r[0] for r in conn.execute("SELECT product_code FROM master_data")]
+                self._matcher = CodeMatcher(codes)
+                self._matcher_version = version
+        finally:
+            conn.close()
+        return self._matcher
+
+    def _add_suggestions(self, enriched_df: pd.DataFrame, df_working: pd.DataFrame, summary: Dict):
+        """
+        Fills suggested_code / suggestion_score for SKIPPED_NO_MATCH rows.
+        """
+        if enriched_df.empty:
+            return
+        no_match = (enriched_df['reconciliation_status'] == 'SKIPPED_NO_MATCH').to_numpy()
+        enriched_df['suggested_code'] = None
+        enriched_df['suggestion_score'] = None
+        summary['suggested'] = 0
+        if not no_match.any():
+            return
+
+        codes = [normalize_product_code(v) for v in df_working['product_code'].to_numpy()[no_match]]
+        suggestions = self.get_matcher().suggest_many(codes)
+        enriched_df.loc[no_match, 'suggested_code'] = suggestions['suggested_code'].to_numpy()
+        enriched_df.loc[no_match, 'suggestion_score'] = suggestions['suggestion_score'].to_numpy()
+        summary['suggested'] = int(suggestions['suggested_code'].notna().sum())
+
+    def process_file(self, file_path: str, upload_id: str = None, as_of=None,
+                     batch_size: int = None, resume: bool = False,
+                     required_columns_only: bool = False, filename: str = None) -> Tuple[pd.DataFrame, Dict]:
         """
         Main entry point for processing an uploaded file.
         Returns (enriched_df, summary_report).
         enriched_df is a SAFE, derived DataFrame suitable for user download.
+
+        If as_of (datetime or ISO string, UTC unless it has an offset) is
+        given, the file is reconciled against master_data as it was at that
+        time and nothing is written; the update counters then say what
+        the file would have changed. No match suggestions are made, as the
+        matcher only knows the current catalog.
+
+        If batch_size is given, rows are committed in batches with a
+        checkpoint after each; pass resume=True with the same upload_id to
+        continue an interrupted run.
+
+        required_columns_only skips parsing input columns the reconciliation
+        does not use (the enriched output then omits them too).
+
+        file_path may also be a readable binary stream (e.g. the request's
+        upload stream); filename then names the format.
         """
         if not upload_id:
             upload_id = str(uuid.uuid4())
+
+        if as_of is not None:
+            try:
+                as_of = PriceHistoryService.normalize_timestamp(as_of)
+            except ValueError:
+                return None, {"error": f"Invalid as_of timestamp: {as_of}"}
             
         print(f"Processing Upload ID: {upload_id}")
         
         # 1. Parse File
         try:
-            if file_path.endswith('.csv'):
-                df_input = pd.read_csv(file_path)
-            elif file_path.endswith(('.xls', '.xlsx')):
-                df_input = pd.read_excel(file_path)
-            else:
-                return None, {"error": "Unsupported file format"}
+            usecols = None
+            if required_columns_only:
+                usecols = lambda c: str(c).lower().strip() in RECONCILE_COLUMNS
+            df_input = read_upload(file_path, filename, usecols=usecols)
+        except UnsupportedFormatError:
+            return None, {"error": "Unsupported file format"}
         except Exception as e:
             return None, {"error": f"Failed to parse file: {str(e)}"}
 
@@ -85,16 +384,9 @@ class ReconciliationEngine:
         
         # Create a working copy
         df_working = df_input.copy()
-        df_working.columns = [c.lower().strip() for c in df_working.columns]
         
-        # Mapping aliases
-        col_map = {
-            'product_id': 'product_code',
-            'model': 'product_code',
-            'unit_price': 'price',
-            'qty': 'quantity'
-        }
-        df_working.rename(columns=col_map, inplace=True)
+        # Lower-case headers and map aliases
+        normalize_columns(df_working)
         
         if 'product_code' not in df_working.columns:
             return None, {"error": "Missing required column: product_code"}
@@ -107,146 +399,250 @@ class ReconciliationEngine:
             "updated_quantity": 0,
             "errors": []
         }
+        if as_of is not None:
+            summary['as_of'] = as_of
+
+        # Clean numeric columns for the whole file at once. Rejected cells
+        # are treated as blank (the DB value is kept) and reported.
+        try:
+            if 'price' in df_working.columns:
+                df_working['price'], reasons = clean_price_column(df_working['price'])
+                summary['errors'].extend(rejection_messages(reasons, 'price'))
+            if 'quantity' in df_working.columns:
+                df_working['quantity'], reasons = clean_quantity_column(df_working['quantity'])
+                summary['errors'].extend(rejection_messages(reasons, 'quantity'))
+        except Exception as e:
+            return None, {"error": f"Failed to read numeric columns: {str(e)}"}
         
+        if batch_size and as_of is None:
+            return self._process_in_batches(filename or file_path, df_input, df_working, upload_id, summary, batch_size, resume)
+
+        try:
+            enriched_rows = self._run_in_transaction(
+                upload_id,
+                df_working,
+                lambda conn: self._reconcile(conn, df_input, df_working, upload_id, summary, as_of),
+                summary,
+                read_only=as_of is not None
+            )
+        except Exception as e:
+            logging.error(f"Transaction failed for {upload_id}: {e}")
+            summary['error_fatal'] = str(e)
+            return None, summary
+
+        logging.info(f"Upload {upload_id} processed successfully.")
+        if as_of is None and self.coordinator is None:
+            self.refresh_catalog()
+
+        # Create the DataFrame
+        enriched_df = pd.DataFrame(enriched_rows)
+        if as_of is None:
+            self._add_suggestions(enriched_df, df_working, summary)
+        return enriched_df, summary
+
+    def _run_in_transaction(self, upload_id, df_working, work, summary, read_only=False):
+        """
+        Runs work(conn) inside one write transaction and returns its result.
+        With a WriteCoordinator the work is queued there so concurrent
+        uploads are group-committed; conflicts it reports are added to the
+        summary. Raises if the transaction was rolled back.
+        """
+        if self.coordinator is not None and not read_only:
+            product_codes = {
+                code for code in (normalize_product_code(v) for v in df_working['product_code']) if code
+            }
+            future = self.coordinator.submit(upload_id, product_codes, work, size=len(df_working))
+            result = future.wait(WRITE_TIMEOUT_SECONDS)
+            for c in future.conflicts:
+                summary.setdefault('conflicts', []).append(c)
+                summary['errors'].append(
+                    f"Upload {c['upload_id']} was in flight for {len(c['product_codes'])} of the same "
+                    f"product codes; it was applied first."
+                )
+            return result
+
+        conn = self.db.get_connection()
+        conn.isolation_level = None 
+        try:
+            conn.execute("BEGIN TRANSACTION;")
+            result = work(conn)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _process_in_batches(self, file_path, df_input, df_working, upload_id, summary, batch_size, resume):
+        """
+        Resumable mode: commits every batch_size rows together with a
+        checkpoint (offset, counters, enriched rows of the batch), so an
+        interrupted upload_id can continue where it stopped.
+        """
+        checkpoints = CheckpointService(self.db)
+        state = checkpoints.load(upload_id)
+        content_hash = CheckpointService.content_hash(df_input)
+
+        start = 0
+        if resume:
+            if state is None:
+                return None, {"error": f"No checkpoint found for upload {upload_id}"}
+            if state['status'] == 'COMPLETED':
+                return None, {"error": f"Upload {upload_id} has already completed"}
+            if state['total_rows'] != len(df_working):
+                return None, {"error": f"File has {len(df_working)} rows but checkpoint expects {state['total_rows']}"}
+            if state['content_hash'] and state['content_hash'] != content_hash:
+                return None, {"error": f"File content differs from the file checkpointed for upload {upload_id}"}
+            for key in CheckpointService.COUNTERS:
+                summary[key] = state['summary'][key]
+            start = state['last_offset']
+            print(f"Resuming Upload ID {upload_id} at row {start}")
+        elif state is not None:
+            return None, {"error": f"Upload {upload_id} already has a checkpoint; resume it instead"}
+
+        for batch_start in range(start, len(df_working), batch_size):
+            batch = df_working.iloc[batch_start:batch_start + batch_size]
+            batch_end = batch_start + len(batch)
+
+            def work(conn, batch=batch, batch_start=batch_start, batch_end=batch_end):
+                rows = self._reconcile(conn, df_input, batch, upload_id, summary)
+                checkpoints.save(conn, upload_id, file_path, len(df_working), batch_start, batch_end, rows, summary,
+                                 content_hash)
+                return rows
+
+            counters = {key: summary[key] for key in CheckpointService.COUNTERS}
+            try:
+                self._run_in_transaction(upload_id, batch, work, summary)
+            except Exception as e:
+                # The failed batch was rolled back; so are its counters.
+                summary.update(counters)
+                logging.error(f"Batch {batch_start}-{batch_end} failed for {upload_id}: {e}")
+                summary['error_fatal'] = str(e)
+                summary['resume_offset'] = batch_start
+                return None, summary
+
+        logging.info(f"Upload {upload_id} processed successfully.")
+        if self.coordinator is None:
+            self.refresh_catalog()
+
+        enriched_df = pd.DataFrame(checkpoints.load_rows(upload_id))
+        checkpoints.complete(upload_id)
+        self._add_suggestions(enriched_df, df_working, summary)
+        return enriched_df, summary
+
+    def _reconcile(self, conn, df_input, df_working, upload_id, summary, as_of=None) -> List[Dict]:
+        """
+        Matches every row against master_data and applies updates on conn.
+        The caller owns the transaction. Returns the enriched output rows.
+        """
         # PREPARE ENRICHED OUTPUT
         # Start with original input data to preserve context
         enriched_rows = [] 
 
-        conn = self.db.get_connection()
-        conn.isolation_level = None 
         cursor = conn.cursor()
         audit = AuditService(conn)
+        history = PriceHistoryService(conn)
 
-        try:
-            cursor.execute("BEGIN TRANSACTION;")
+        for index, row in df_working.iterrows():
+            # Base enriched row from input
+            output_row = df_input.iloc[index].to_dict()
             
-            for index, row in df_working.iterrows():
-                # Base enriched row from input
-                output_row = df_input.iloc[index].to_dict()
-                
-                # Default Status
-                status = "SKIPPED_INVALID_DATA"
-                final_amt = 0.0
-                price_used = 0.0
-                qty_used = 0
-                
-                # Normalize product_code
-                raw_val = row['product_code']
-                p_code = None
-                
-                if pd.api.types.is_number(raw_val) and pd.notna(raw_val):
-                     if float(raw_val).is_integer():
-                         p_code = str(int(raw_val))
-                     else:
-                         p_code = str(raw_val).strip()
-                elif pd.notna(raw_val):
-                     p_code = str(raw_val).strip()
-
-                if not p_code:
-                    # Invalid product code
-                    output_row.update({
-                        'reconciliation_status': 'SKIPPED_INVALID_ID',
-                        'final_amount': 0.0
-                    })
-                    enriched_rows.append(output_row)
-                    summary['skipped'] += 1
-                    continue
-
-                new_price = row.get('price')
-                new_qty = row.get('quantity')
-                
-                # 2. MATCH
+            # Default Status
+            status = "SKIPPED_INVALID_DATA"
+            
+            # Normalize product_code
+            p_code = normalize_product_code(row['product_code'])
+
+            if not p_code:
+                # Invalid product code
+                output_row.update({
+                    'reconciliation_status': 'SKIPPED_INVALID_ID',
+                    'final_amount': 0.0
+                })
+                enriched_rows.append(output_row)
+                summary['skipped'] += 1
+                continue
+
+            new_price = row.get('price')
+            new_qty = row.get('quantity')
+            
+            # 2. MATCH
+            if as_of is None:
                 cursor.execute("SELECT price, quantity, description FROM master_data WHERE product_code = ?", (p_code,))
                 result = cursor.fetchone()
-                
-                if not result:
-                    logging.warning(f"Row {index}: Product {p_code} NOT FOUND. Skipping.")
-                    summary['skipped'] += 1
-                    output_row.update({
-                        'reconciliation_status': 'SKIPPED_NO_MATCH',
-                        'final_amount': 0.0
-                    })
-                    enriched_rows.append(output_row)
-                    continue
-                
-                db_price, db_qty, db_desc = result
-                # Handle None/NaN
-                db_price = Decimal(str(db_price)) if db_price is not None else Decimal("0.00")
-                db_qty = int(db_qty) if db_qty is not None else 0
-                
-                summary['matched'] += 1
-                status = "UPDATED" # Default if matched, assuming we recompute
-                
-                # 3. UPDATE LOGIC
-                updates = {}
-                old_values = {'price': float(db_price), 'quantity': db_qty}
-                
-                updated_price = db_price
-                updated_qty = db_qty
-                
-                # Update Price if present
-                if pd.notna(new_price):
-                    try:
-                        val = Decimal(str(new_price))
-                        if val != db_price:
-                            updates['price'] = float(val)
-                            updated_price = val
-                            summary['updated_price'] += 1
-                    except:
-                        pass # Keep original if invalid
-
-                # Update Quantity if present
-                if pd.notna(new_qty):
-                    try:
-                        val = int(new_qty)
-                        if val != db_qty:
-                            updates['quantity'] = val
-                            updated_qty = val
-                            summary['updated_quantity'] += 1
-                    except:
-                        pass # Keep original
-
-                # 4. COMPUTE final_amount
-                final_amt_val = updated_price * updated_qty
-                
-                # Update DB 'final_amount' as well
-                updates['final_amount'] = float(final_amt_val)
-                updates['last_updated_at'] = datetime.datetime.now()
-                
-                # Perform DB Update
-                if updates:
-                    set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-                    values = list(updates.values())
-                    values.append(p_code)
-                    
-                    cursor.execute(f"UPDATE master_data SET {set_clause} WHERE product_code = ?", values)
-                    
-                    # Log Audit
-                    audit.log_update(upload_id, p_code, old_values, updates)
-                
-                # 5. BUILD OUTPUT ROW (Explicit)
+            else:
+                result = history.lookup(p_code, as_of)
+            
+            if not result:
+                logging.warning(f"Row {index}: Product {p_code} NOT FOUND. Skipping.")
+                summary['skipped'] += 1
                 output_row.update({
-                    'reconciliation_status': status,
-                    'price_used': float(updated_price),
-                    'quantity_used': int(updated_qty),
-                    'final_amount': float(final_amt_val)
+                    'reconciliation_status': 'SKIPPED_NO_MATCH',
+                    'final_amount': 0.0
                 })
                 enriched_rows.append(output_row)
+                continue
+            
+            db_price, db_qty, db_desc = result
+            # Handle None/NaN
+            db_price = Decimal(str(db_price)) if db_price is not None else Decimal("0.00")
+            db_qty = int(db_qty) if db_qty is not None else 0
+            
+            summary['matched'] += 1
+            status = "UPDATED" # Default if matched, assuming we recompute
+            
+            # 3. UPDATE LOGIC
+            updates = {}
+            old_values = {'price': float(db_price), 'quantity': db_qty}
+            
+            updated_price = db_price
+            updated_qty = db_qty
+            
+            # Update Price if present (already cleaned column-wise)
+            if pd.notna(new_price):
+                val = Decimal(str(new_price))
+                if val != db_price:
+                    updates['price'] = float(val)
+                    updated_price = val
+                    summary['updated_price'] += 1
 
-            conn.commit()
-            logging.info(f"Upload {upload_id} processed successfully.")
+            # Update Quantity if present
+            if pd.notna(new_qty):
+                val = int(new_qty)
+                if val != db_qty:
+                    updates['quantity'] = val
+                    updated_qty = val
+                    summary['updated_quantity'] += 1
+
+            # 4. COMPUTE final_amount
+            final_amt_val = updated_price * updated_qty
             
-            # Create the DataFrame
-            enriched_df = pd.DataFrame(enriched_rows)
-            return enriched_df, summary
+            # Update DB 'final_amount' as well
+            updates['final_amount'] = float(final_amt_val)
+            updates['last_updated_at'] = utc_now()
             
-        except Exception as e:
-            conn.rollback()
-            logging.error(f"Transaction failed for {upload_id}: {e}")
-            summary['error_fatal'] = str(e)
-            return None, summary
-        finally:
-            conn.close()
+            # Perform DB Update (point-in-time runs are read-only)
+            if updates and as_of is None:
+                set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+                values = list(updates.values())
+                values.append(p_code)
+                
+                cursor.execute(f"UPDATE master_data SET {set_clause} WHERE product_code = ?", values)
+                
+                # Log Audit
+                audit.log_update(upload_id, p_code, old_values, updates)
+            
+            # 5. BUILD OUTPUT ROW (Explicit)
+            output_row.update({
+                'reconciliation_status': status,
+                'price_used': float(updated_price),
+                'quantity_used': int(updated_qty),
+                'final_amount': float(final_amt_val)
+            })
+            enriched_rows.append(output_row)
+
+        return enriched_rows
 
 def print_summary(summary):
     print("\n=== Upload Processing Summary ===")
@@ -258,29 +654,85 @@ def print_summary(summary):
     if 'error_fatal' in summary:
         print(f"❌ CRITICAL ERROR: Transaction Rolled Back.")
         print(f"Reason: {summary['error_fatal']}")
+        if 'resume_offset' in summary:
+            print(f"Rows before {summary['resume_offset']} are committed; re-run with --resume to continue.")
         return
 
     print(f"Total Rows In File: {summary['total_rows']}")
     print(f"✅ Matched & Processed: {summary['matched']}")
     print(f"🚫 Skipped (No Match):   {summary['skipped']}")
-    print(f"💲 Price Updates:       {summary['updated_price']}")
-    print(f"📦 Quantity Updates:    {summary['updated_quantity']}")
+    if summary.get('suggested'):
+        print(f"🔎 Match Suggestions:   {summary['suggested']} (see suggested_code column)")
+    not_written = " (hypothetical, not written)" if 'as_of' in summary else ""
+    print(f"💲 Price Updates:       {summary['updated_price']}{not_written}")
+    print(f"📦 Quantity Updates:    {summary['updated_quantity']}{not_written}")
+    if 'as_of' in summary:
+        print(f"🕒 Prices As Of:        {summary['as_of']}")
     
     if summary['errors']:
         print("\nWarnings:")
-        for err in summary['errors']:
+        for err in summary['errors'][:MAX_PRINTED_ERRORS]:
             print(f" - {err}")
+        if len(summary['errors']) > MAX_PRINTED_ERRORS:
+            print(f" ... and {len(summary['errors']) - MAX_PRINTED_ERRORS} more")
             
-    print("\nStatus: SUCCESS (Committed to Database)")
+    if 'as_of' in summary:
+        print("\nStatus: SUCCESS (Point-in-time report, database unchanged)")
+    else:
+        print("\nStatus: SUCCESS (Committed to Database)")
+
+def print_inventory_summary(aggregates: AggregateService):
+    totals = aggregates.get_totals()
+    print("\n=== Inventory Summary ===")
+    print(f"Products:           {totals['product_count']}")
+    print(f"Total Quantity:     {totals['total_quantity']}")
+    print(f"Total Final Amount: {totals['total_final_amount']:.2f}")
+
+    categories = aggregates.get_category_summary()
+    if categories:
+        print("\nBy Category:")
+        for c in categories:
+            print(f" - {c['description']}: {c['product_count']} products, "
+                  f"qty {c['total_quantity']}, amount {c['total_final_amount']:.2f}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Secure Data Reconciliation Engine")
-    parser.add_argument("file", help="Path to Excel/CSV file to process")
+    parser.add_argument("file", nargs="?", help="Path to Excel/CSV file to process")
+    parser.add_argument("--upload-id", help="Upload ID to use (required with --resume)")
+    parser.add_argument("--batch-size", type=int, help="Commit every N rows with a resumable checkpoint")
+    parser.add_argument("--resume", action="store_true", help="Resume the checkpointed --upload-id")
+    parser.add_argument("--required-columns-only", action="store_true",
+                        help="Only parse product/price/quantity columns (faster for wide files)")
+    parser.add_argument("--as-of", help="Reconcile against prices valid at this ISO timestamp, UTC unless an offset is given (read-only)")
+    parser.add_argument("--summary", action="store_true", help="Print inventory totals per category and exit")
+    parser.add_argument("--rebuild-summary", action="store_true", help="Recompute aggregate tables from master_data")
     args = parser.parse_args()
-    
+
+    # One-shot runs do not rewrite the catalog file; the app notices the
+    # new data_version and re-exports in the background.
+    engine = ReconciliationEngine(catalog_path=None)
+
+    if args.rebuild_summary:
+        engine.aggregates.rebuild()
+    if args.summary or args.rebuild_summary:
+        print_inventory_summary(engine.aggregates)
+        exit(0)
+
+    if not args.file:
+        parser.error("file is required unless --summary is given")
+
     if not os.path.exists(args.file):
         print(f"Error: File {args.file} not found.") and exit(1)
         
-    engine = ReconciliationEngine()
-    result = engine.process_file(args.file)
+    if args.resume and not (args.upload_id and args.batch_size):
+        parser.error("--resume requires --upload-id and --batch-size")
+
+    result = engine.process_file(
+        args.file,
+        upload_id=args.upload_id,
+        as_of=args.as_of,
+        batch_size=args.batch_size,
+        resume=args.resume,
+        required_columns_only=args.required_columns_only
+    )
     print_summary(result[1])
@@ -1,13 +1,21 @@
 import unittest
-import pandas as pd
 import os
 import sys
-from unittest.mock import patch
 import io
+import sqlite3
+import datetime
+import tempfile
+from unittest.mock import patch
+
+import pandas as pd
 
 # Modify sys.path to ensure we can import secure_processor
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 import secure_processor
+from secure_reconcile import ReconciliationEngine
+from write_coordinator import WriteCoordinator
+from columnar_catalog import MappedCatalog, export_catalog
+from result_store import ResultStore
 
 class TestSecureSystem(unittest.TestCase):
     
@@ -30,8 +38,9 @@ class TestSecureSystem(unittest.TestCase):
         secure_processor.setup_logging(self.test_log_file)
 
     def tearDown(self):
-        if os.path.exists(self.test_db):
-            os.remove(self.test_db)
+        for path in (self.test_db, self.test_db + '.idx.npy'):
+            if os.path.exists(path):
+                os.remove(path)
         if os.path.exists(self.test_log_dir):
             import shutil
             shutil.rmtree(self.test_log_dir)
@@ -61,6 +70,50 @@ class TestSecureSystem(unittest.TestCase):
         self.assertIn("Item_Total", output)
         self.assertIn("50.00", output)
 
+    @patch('builtins.input')
+    def test_standard_user_reports_unmatched_products(self, mock_input):
+        user_file = 'user_upload_test.csv'
+        pd.DataFrame({
+            'Product_Name': ['Item2', 'Missing', 'Item1'],
+            'Quantity': [2, 1, 1],
+            'Notes': ['a', 'b', 'c']
+        }).to_csv(user_file, index=False)
+        mock_input.return_value = user_file
+
+        captured_output = io.StringIO()
+        old_stdout = sys.stdout
+        sys.stdout = captured_output
+        try:
+            secure_processor.standard_user_flow()
+        finally:
+            sys.stdout = old_stdout
+            os.remove(user_file)
+
+        output = captured_output.getvalue()
+        self.assertIn("Grand Total: 50.00", output)
+        self.assertIn("Unmatched products (1, not in price database): Missing", output)
+
+    @patch('builtins.input')
+    def test_standard_user_reports_unpriced_products(self, mock_input):
+        pd.DataFrame({'model': ['Item1', 'B'], 'price': [10.0, 'call us']}).to_csv(self.test_db, index=False)
+        user_file = 'user_upload_test.csv'
+        pd.DataFrame({'Product_Name': ['B', 'Item1'], 'Quantity': [3, 2]}).to_csv(user_file, index=False)
+        mock_input.return_value = user_file
+
+        captured_output = io.StringIO()
+        old_stdout = sys.stdout
+        sys.stdout = captured_output
+        try:
+            secure_processor.standard_user_flow()
+        finally:
+            sys.stdout = old_stdout
+            os.remove(user_file)
+
+        output = captured_output.getvalue()
+        self.assertIn("Grand Total: 20.00", output)
+        self.assertNotIn("| B ", output)  # not billed at 0.00
+        self.assertIn("Products without a valid price (1, excluded from total): B", output)
+
     @patch('builtins.input', side_effect=['NewModel', 'New Description', '100.0']) 
     def test_admin_add_product(self, mock_input):
         # Input: ID(Model), Name(Desc), Price
@@ -83,5 +136,416 @@ class TestSecureSystem(unittest.TestCase):
         df = pd.read_csv(self.test_db)
         self.assertFalse('Item1' in df['model'].values) # Should be deleted
 
+    def test_price_page_filters_and_pages(self):
+        pd.DataFrame({
+            'model': [f'SC{i}' for i in range(30)] + ['FS1', 'FS2'],
+            'price': [float(i) for i in range(30)] + [5.0, 500.0]
+        }).to_csv(self.test_db, index=False)
+
+        page, has_more = secure_processor.get_price_page(1, 10, prefix='SC', min_price=5)
+        self.assertEqual(list(page['Product_ID'][:2]), ['SC5', 'SC6'])
+        self.assertTrue(has_more)
+        page, has_more = secure_processor.get_price_page(3, 10, prefix='SC', min_price=5)
+        self.assertEqual(list(page['Product_ID']), ['SC25', 'SC26', 'SC27', 'SC28', 'SC29'])
+        self.assertFalse(has_more)
+
+    def test_log_page_seeks_by_date_and_action(self):
+        log_file = os.path.join(self.test_log_dir, 'big.log')
+        with open(log_file, 'w') as f:
+            for day in range(1, 4):
+                for i in range(1500):
+                    action = 'ADD_PRODUCT' if i % 2 else 'UPDATE_PRICE'
+                    f.write(f"2026-01-0{day} 10:00:00,000 - INFO - {action}: ID=P{i} - SUCCESS\n")
+
+        lines, offset = secure_processor.read_log_page(
+            None, 5, date_from='2026-01-02', date_to='2026-01-02', action='ADD_PRODUCT', log_file=log_file)
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(all(l.startswith('2026-01-02') and 'ADD_PRODUCT' in l for l in lines))
+        self.assertTrue(os.path.exists(log_file + '.idx'))
+
+        total = len(lines)
+        while offset is not None:
+            lines, offset = secure_processor.read_log_page(
+                offset, 500, date_from='2026-01-02', date_to='2026-01-02', action='ADD_PRODUCT', log_file=log_file)
+            total += len(lines)
+        self.assertEqual(total, 750)
+
+class TestReconciliationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'test_enterprise.db')
+        self.catalog_path = os.path.join(self.tmp_dir, 'catalog.npy')
+        self.engine = ReconciliationEngine(db_path=self.db_path, catalog_path=self.catalog_path)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO master_data (product_code, description, quantity, price, final_amount, last_updated_at) "
+            "VALUES (?, ?, ?, ?, ?, '2020-01-01 00:00:00')",
+            [('A1', 'Cat1', 2, 10.0, 20.0), ('A2', 'Cat1', 1, 5.0, 5.0), ('B1', 'Cat2', 0, 7.0, 0.0)]
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        import shutil
+        self.engine.catalog_exporter.flush(10)
+        shutil.rmtree(self.tmp_dir)
+
+    def write_upload(self, df, name='upload.csv'):
+        path = os.path.join(self.tmp_dir, name)
+        df.to_csv(path, index=False)
+        return path
+
+    def test_aggregates_follow_reconciliation(self):
+        upload = self.write_upload(pd.DataFrame({'model': ['A1', 'B1'], 'quantity': [3, 4]}))
+        enriched_df, summary = self.engine.process_file(upload)
+        self.assertEqual(summary['matched'], 2)
+
+        totals = self.engine.aggregates.get_totals()
+        self.assertEqual(totals['product_count'], 3)
+        self.assertEqual(totals['total_quantity'], 8)
+        self.assertAlmostEqual(totals['total_final_amount'], 30.0 + 5.0 + 28.0)
+
+        cat2 = self.engine.aggregates.get_category_summary('Cat2')[0]
+        self.assertEqual(cat2['total_quantity'], 4)
+        self.assertAlmostEqual(cat2['total_final_amount'], 28.0)
+
+        before = self.engine.aggregates.get_category_summary()
+        self.engine.aggregates.rebuild()
+        self.assertEqual(before, self.engine.aggregates.get_category_summary())
+
+    def test_point_in_time_reconciliation(self):
+        upload = self.write_upload(pd.DataFrame({'model': ['A1'], 'price': [12.0], 'quantity': [2]}))
+        self.engine.process_file(upload)
+
+        historic = self.write_upload(pd.DataFrame({'model': ['A1', 'A2'], 'quantity': [1, 9]}), 'historic.csv')
+        enriched_df, summary = self.engine.process_file(historic, as_of='2021-06-01')
+        self.assertEqual(summary['as_of'], '2021-06-01 00:00:00')
+        self.assertEqual(enriched_df.loc[0, 'price_used'], 10.0)
+
+        enriched_df, summary = self.engine.process_file(historic, as_of='2019-01-01')
+        self.assertEqual(summary['matched'], 0)
+
+        # History is kept in UTC; offsets are converted before comparing
+        _, summary = self.engine.process_file(historic, as_of='2021-06-01T05:30:00+05:30')
+        self.assertEqual(summary['as_of'], '2021-06-01 00:00:00')
+        enriched_df, _ = self.engine.process_file(historic, as_of=datetime.datetime.now(datetime.timezone.utc))
+        self.assertEqual(enriched_df.loc[0, 'price_used'], 12.0)
+
+        # Point-in-time runs must not touch master_data
+        conn = sqlite3.connect(self.db_path)
+        qty = conn.execute("SELECT quantity FROM master_data WHERE product_code = 'A2'").fetchone()[0]
+        versions = conn.execute("SELECT count(*) FROM price_history WHERE product_code = 'A1'").fetchone()[0]
+        conn.close()
+        self.assertEqual(qty, 1)
+        self.assertEqual(versions, 2)
+
+    def test_coordinator_reports_conflicts_and_commits(self):
+        import threading
+        coordinator = WriteCoordinator(db_path=self.db_path)
+        engine = ReconciliationEngine(db_path=self.db_path, coordinator=coordinator, catalog_path=self.catalog_path)
+        release = threading.Event()
+
+        def slow_write(conn):
+            release.wait(5)
+            conn.execute("UPDATE master_data SET quantity = 50 WHERE product_code = 'A1'")
+
+        try:
+            first = coordinator.submit('upload-1', {'A1'}, slow_write)
+            upload = self.write_upload(pd.DataFrame({'model': ['A1', 'A2'], 'quantity': [7, 8]}))
+            result = {}
+            worker = threading.Thread(target=lambda: result.update(out=engine.process_file(upload)))
+            worker.start()
+            # Hold the first write until the upload has been queued behind it
+            import time
+            deadline = time.time() + 5
+            while len(coordinator._in_flight) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            release.set()
+            worker.join(10)
+            first.result(5)
+        finally:
+            coordinator.shutdown()
+
+        enriched_df, summary = result['out']
+        self.assertEqual(summary['matched'], 2)
+        self.assertEqual(summary['conflicts'][0]['upload_id'], 'upload-1')
+        self.assertEqual(summary['conflicts'][0]['product_codes'], ['A1'])
+
+        conn = sqlite3.connect(self.db_path)
+        qty = conn.execute("SELECT quantity FROM master_data WHERE product_code = 'A1'").fetchone()[0]
+        conn.close()
+        self.assertEqual(qty, 7)
+        # The commit scheduled a background catalog export
+        self.assertTrue(engine.catalog_exporter.flush(10))
+        self.assertEqual(MappedCatalog(self.catalog_path).lookup('A1')['quantity'], 7)
+
+    def test_coordinator_never_leaves_callers_waiting(self):
+        import threading
+        from concurrent.futures import TimeoutError
+
+        # A writer that cannot open the database fails queued and new jobs
+        broken = WriteCoordinator(db_path=os.path.join(self.tmp_dir, 'missing', 'x.db'))
+        broken._thread.join(5)
+        with self.assertRaises(RuntimeError):
+            broken.submit('upload-1', {'A1'}, lambda conn: None).wait(5)
+
+        # A job still queued when its caller times out is cancelled, never run
+        coordinator = WriteCoordinator(db_path=self.db_path)
+        release = threading.Event()
+        try:
+            coordinator.submit('slow', {'A1'}, lambda conn: release.wait(5))
+            queued = coordinator.submit('late', {'A1'}, lambda conn: conn.execute(
+                "UPDATE master_data SET quantity = 99 WHERE product_code = 'A1'"))
+            with self.assertRaises(TimeoutError):
+                queued.wait(0.1)
+            self.assertTrue(queued.cancelled())
+            release.set()
+        finally:
+            coordinator.shutdown()
+        with self.assertRaises(RuntimeError):
+            coordinator.submit('after', {'A1'}, lambda conn: None)
+
+        conn = sqlite3.connect(self.db_path)
+        qty = conn.execute("SELECT quantity FROM master_data WHERE product_code = 'A1'").fetchone()[0]
+        conn.close()
+        self.assertNotEqual(qty, 99)
+
+    def test_catalog_file_regenerated_after_commit(self):
+        upload = self.write_upload(pd.DataFrame({'model': ['B1'], 'price': [9.5], 'quantity': [2]}))
+        self.engine.process_file(upload)
+        self.assertTrue(self.engine.catalog_exporter.flush(10))
+
+        catalog = MappedCatalog(self.catalog_path)
+        self.assertEqual(len(catalog), 3)
+        self.assertEqual(catalog.lookup('B1')['price'], 9.5)
+        self.assertEqual(catalog.lookup('B1')['final_amount'], 19.0)
+        self.assertIsNone(catalog.lookup('ZZZ-LONGER-THAN-ANY-CODE'))
+        self.assertEqual(list(catalog.lookup_many(['A2', 'nope', 'A1'])['product_code']), ['A2', 'A1'])
+
+    def test_concurrent_catalog_exports(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            futures = [pool.submit(export_catalog, self.db_path, self.catalog_path) for _ in range(6)]
+            self.assertEqual([f.result() for f in futures], [3] * 6)
+        self.assertEqual(len(MappedCatalog(self.catalog_path)), 3)
+
+    def test_catalog_exporter_coalesces_and_catches_external_writes(self):
+        from unittest.mock import patch as patch_obj
+        import columnar_catalog
+        exporter = columnar_catalog.CatalogExporter(self.db_path, self.catalog_path)
+        real_write = columnar_catalog.write_catalog
+        with patch_obj.object(columnar_catalog, 'write_catalog', side_effect=real_write) as write:
+            for _ in range(20):
+                exporter.request()
+            self.assertTrue(exporter.flush(10))
+            self.assertLessEqual(write.call_count, 2)
+
+            exporter.ensure_fresh()  # nothing changed since the export
+            self.assertTrue(exporter.flush(10))
+            exports = write.call_count
+
+            # A write from another process (e.g. a CLI run) makes it stale
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("UPDATE master_data SET price = 42.0 WHERE product_code = 'A2'")
+            conn.commit()
+            conn.close()
+            exporter.ensure_fresh()
+            self.assertTrue(exporter.flush(10))
+            self.assertEqual(write.call_count, exports + 1)
+        self.assertEqual(MappedCatalog(self.catalog_path).lookup('A2')['price'], 42.0)
+        self.assertFalse([f for f in os.listdir(self.tmp_dir) if f.endswith('.tmp')])
+
+    def test_price_cleaning_reports_rejected_rows(self):
+        upload = self.write_upload(pd.DataFrame({
+            'model': ['A1', 'A2', 'B1'],
+            'price': ['₹ 1,10,000.50', '-5', 'abc'],
+            'quantity': ['1', '2', '1.5']
+        }))
+        enriched_df, summary = self.engine.process_file(upload)
+
+        self.assertEqual(enriched_df.loc[0, 'price_used'], 110000.5)
+        self.assertEqual(enriched_df.loc[1, 'price_used'], 5.0)   # negative rejected, DB price kept
+        self.assertEqual(enriched_df.loc[2, 'quantity_used'], 0)  # 1.5 rejected, DB quantity kept
+        self.assertIn("Row 1: price rejected (negative value -5.0)", summary['errors'])
+        self.assertIn("Row 2: price rejected (unparseable value 'abc')", summary['errors'])
+        self.assertIn("Row 2: quantity rejected (not a whole number 1.5)", summary['errors'])
+
+    def test_non_finite_values_are_rejected(self):
+        path = os.path.join(self.tmp_dir, 'inf.csv')
+        with open(path, 'w') as f:
+            f.write("model,price,quantity\nA1,inf,3\nA2,-inf,0\nB1,7.0,inf\n")
+        enriched_df, summary = self.engine.process_file(path)
+
+        self.assertEqual(summary['matched'], 3)
+        self.assertEqual(list(enriched_df['price_used']), [10.0, 5.0, 7.0])  # DB prices kept
+        self.assertIn("Row 0: price rejected (non-finite value inf)", summary['errors'])
+        self.assertIn("Row 1: price rejected (non-finite value -inf)", summary['errors'])
+        self.assertIn("Row 2: quantity rejected (non-finite value inf)", summary['errors'])
+        totals = self.engine.aggregates.get_totals()
+        self.assertTrue(pd.notna(totals['total_final_amount']) and totals['total_final_amount'] < float('inf'))
+
+    def test_price_cleaning_rejects_ambiguous_grouping(self):
+        from price_cleaning import clean_price_column
+        values, reasons = clean_price_column(pd.Series(['12,50', '1,23,45', 'Rs. 1,23,45', '10,97,000', '1,097,000.50']))
+
+        self.assertTrue(values[:3].isna().all())
+        self.assertEqual(list(reasons[:3]), ["unparseable value '12,50'", "unparseable value '1,23,45'",
+                                             "unparseable value 'Rs. 1,23,45'"])
+        self.assertEqual(list(values[3:]), [1097000.0, 1097000.5])
+
+    def test_unmatched_codes_get_suggestions(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO master_data (product_code, description, price) VALUES ('SC8000', 'Cat3', 1.0)")
+        conn.execute("INSERT INTO master_data (product_code, description, price) VALUES ('FS7600', 'Cat3', 1.0)")
+        conn.commit()
+        conn.close()
+
+        upload = self.write_upload(pd.DataFrame({'model': ['sc-8000', 'FS760', 'A1', 'QQQQQ']}))
+        enriched_df, summary = self.engine.process_file(upload)
+
+        self.assertEqual(enriched_df.loc[0, 'suggested_code'], 'SC8000')
+        self.assertEqual(enriched_df.loc[0, 'suggestion_score'], 1.0)
+        self.assertEqual(enriched_df.loc[1, 'suggested_code'], 'FS7600')
+        self.assertLess(enriched_df.loc[1, 'suggestion_score'], 1.0)
+        self.assertTrue(pd.isna(enriched_df.loc[2, 'suggested_code']))  # exact match, no suggestion
+        self.assertTrue(pd.isna(enriched_df.loc[3, 'suggested_code']))
+        self.assertEqual(summary['suggested'], 2)
+
+    def test_matcher_rebuilt_when_rowid_is_reused(self):
+        self.engine.get_matcher()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM master_data WHERE product_code = 'B1'")
+        conn.execute("INSERT INTO master_data (product_code, description, price) VALUES ('XK9000', 'Cat3', 1.0)")
+        conn.commit()
+        conn.close()
+
+        # Same count(*) and max(rowid) as before; the matcher must still see the new code
+        upload = self.write_upload(pd.DataFrame({'model': ['xk-9000']}))
+        enriched_df, _ = self.engine.process_file(upload)
+        self.assertEqual(enriched_df.loc[0, 'suggested_code'], 'XK9000')
+
+        _, summary = self.engine.process_file(upload, as_of='2021-06-01')
+        self.assertNotIn('suggested', summary)
+
+    def test_batched_upload_resumes_after_failure(self):
+        upload = self.write_upload(pd.DataFrame({
+            'model': ['A1', 'A2', 'B1', 'NOPE', 'A1'],
+            'quantity': [3, 4, 5, 6, 7]
+        }))
+        real_reconcile = self.engine._reconcile
+
+        def failing_reconcile(conn, df_input, batch, *args, **kwargs):
+            if 4 in batch.index:
+                raise RuntimeError("disk full")
+            return real_reconcile(conn, df_input, batch, *args, **kwargs)
+
+        with patch.object(self.engine, '_reconcile', side_effect=failing_reconcile):
+            enriched_df, summary = self.engine.process_file(upload, upload_id='job-1', batch_size=2)
+        self.assertIsNone(enriched_df)
+        self.assertEqual(summary['resume_offset'], 4)
+
+        conn = sqlite3.connect(self.db_path)
+        committed = conn.execute("SELECT quantity FROM master_data WHERE product_code = 'B1'").fetchone()[0]
+        conn.close()
+        self.assertEqual(committed, 5)
+
+        # Same row count, different content: refuse to mix it into job-1
+        other = self.write_upload(pd.DataFrame({
+            'model': ['A1', 'A2', 'B1', 'NOPE', 'A2'],
+            'quantity': [3, 4, 5, 6, 7]
+        }), 'other.csv')
+        _, summary = self.engine.process_file(other, upload_id='job-1', batch_size=2, resume=True)
+        self.assertIn('content differs', summary['error'])
+
+        enriched_df, summary = self.engine.process_file(upload, upload_id='job-1', batch_size=2, resume=True)
+        self.assertEqual(len(enriched_df), 5)
+        self.assertEqual(list(enriched_df['quantity_used'].fillna(-1)), [3, 4, 5, -1, 7])
+        self.assertEqual(summary['matched'], 4)
+        self.assertEqual(summary['skipped'], 1)
+
+        _, summary = self.engine.process_file(upload, upload_id='job-1', batch_size=2, resume=True)
+        self.assertIn('already completed', summary['error'])
+
+    def test_compressed_and_zip_uploads(self):
+        import zipfile
+        gz_path = os.path.join(self.tmp_dir, 'store.csv.gz')
+        pd.DataFrame({'model': ['A1'], 'quantity': [4]}).to_csv(gz_path, index=False, compression='gzip')
+        enriched_df, summary = self.engine.process_file(gz_path)
+        self.assertEqual(summary['matched'], 1)
+
+        zip_path = os.path.join(self.tmp_dir, 'stores.zip')
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('store_1.csv', pd.DataFrame({'model': ['A1'], 'quantity': [1]}).to_csv(index=False))
+            archive.writestr('store_2.csv', pd.DataFrame({'model': ['B1', 'X9'], 'quantity': [2, 3]}).to_csv(index=False))
+            archive.writestr('notes.txt', 'ignored')
+        enriched_df, summary = self.engine.process_file(zip_path)
+        self.assertEqual(summary['total_rows'], 3)
+        self.assertEqual(summary['matched'], 2)
+
+        self.assertEqual(list(enriched_df['source_file']), ['store_1.csv', 'store_2.csv', 'store_2.csv'])
+
+        # Store files exported by different systems: headers differ in case and alias
+        mixed_path = os.path.join(self.tmp_dir, 'mixed.zip')
+        with zipfile.ZipFile(mixed_path, 'w') as archive:
+            archive.writestr('a.csv', pd.DataFrame({'Model': ['A1'], 'Qty': [11]}).to_csv(index=False))
+            archive.writestr('b.csv', pd.DataFrame({'model': ['A2'], 'qty': [12]}).to_csv(index=False))
+            archive.writestr('c.csv', pd.DataFrame({'Product_ID': ['B1'], 'Unit_Price': [8.0]}).to_csv(index=False))
+        enriched_df, summary = self.engine.process_file(mixed_path)
+        self.assertNotIn('error', summary)
+        self.assertEqual(summary['matched'], 3)
+        self.assertEqual(list(enriched_df['quantity_used']), [11, 12, 2])
+        self.assertEqual(enriched_df.loc[2, 'price_used'], 8.0)
+
+    def test_excel_reads_all_sheets(self):
+        xlsx_path = os.path.join(self.tmp_dir, 'stores.xlsx')
+        with pd.ExcelWriter(xlsx_path) as writer:
+            pd.DataFrame({'Model': ['A1'], 'Qty': [6], 'Notes': ['x']}).to_excel(writer, sheet_name='Store1', index=False)
+            pd.DataFrame({'Model': ['A2', 'B1'], 'Qty': [1, 2], 'Notes': ['y', 'z']}).to_excel(writer, sheet_name='Store2', index=False)
+
+        enriched_df, summary = self.engine.process_file(xlsx_path, required_columns_only=True)
+        self.assertEqual(summary['matched'], 3)
+        self.assertEqual(list(enriched_df['sheet']), ['Store1', 'Store2', 'Store2'])
+        self.assertEqual(list(enriched_df['quantity_used']), [6, 1, 2])
+        self.assertNotIn('Notes', enriched_df.columns)
+
+        # One sheet per store, each with its own header spelling
+        mixed_path = os.path.join(self.tmp_dir, 'mixed.xlsx')
+        with pd.ExcelWriter(mixed_path) as writer:
+            pd.DataFrame({'Model': ['A1'], 'Qty': [9]}).to_excel(writer, sheet_name='Store1', index=False)
+            pd.DataFrame({'model': ['A2'], 'qty': [8]}).to_excel(writer, sheet_name='Store2', index=False)
+            pd.DataFrame({'Product_ID': ['B1'], 'QTY': [7]}).to_excel(writer, sheet_name='Store3', index=False)
+        enriched_df, summary = self.engine.process_file(mixed_path)
+        self.assertNotIn('error', summary)
+        self.assertEqual(summary['matched'], 3)
+        self.assertEqual(list(enriched_df['quantity_used']), [9, 8, 7])
+
+    def test_result_store_indexes_and_evicts(self):
+        results_dir = os.path.join(self.tmp_dir, 'results')
+        store = ResultStore(results_dir, db_path=self.db_path, ttl_seconds=3600, max_total_bytes=10 ** 9)
+        df = pd.DataFrame({'product_code': ['A1'], 'final_amount': [1.0]})
+
+        first = store.save('upload-aaaa-1', 'store', df)
+        self.assertEqual(store.get('upload-aaaa-1'), first)
+        self.assertIsNone(store.get('missing'))
+
+        # Size cap keeps only the newest file
+        store.max_total_bytes = os.path.getsize(first)
+        second = store.save('upload-bbbb-2', 'store', df)
+        self.assertIsNone(store.get('upload-aaaa-1'))
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(store.get('upload-bbbb-2'), second)
+
+        # TTL expiry
+        store.ttl_seconds = -1
+        self.assertEqual(store.evict(), 1)
+        self.assertEqual(os.listdir(results_dir), [])
+
+    def test_process_file_accepts_stream(self):
+        data = pd.DataFrame({'model': ['A1'], 'quantity': [2]}).to_csv(index=False).encode('utf-8')
+        enriched_df, summary = self.engine.process_file(io.BytesIO(data), filename='store.csv')
+        self.assertEqual(summary['matched'], 1)
+
 if __name__ == '__main__':
     unittest.main()
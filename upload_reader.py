@@ -0,0 +1,132 @@
+import os
+import zipfile
+from typing import Callable, List, Optional, Union
+
+import pandas as pd
+
+# Compressed CSVs are decompressed by pandas as it parses, so the expanded
+# file never touches disk.
+CSV_COMPRESSION = {
+    '.csv': None,
+    '.csv.gz': 'gzip',
+    '.csv.bz2': 'bz2',
+    '.csv.xz': 'xz',
+}
+EXCEL_EXTENSIONS = ('.xls', '.xlsx')
+ARCHIVE_EXTENSIONS = ('.zip',)
+SUPPORTED_EXTENSIONS = tuple(CSV_COMPRESSION) + EXCEL_EXTENSIONS + ARCHIVE_EXTENSIONS
+
+SOURCE_COLUMN = 'source_file'
+SHEET_COLUMN = 'sheet'
+
+# Mapping aliases (normalized header -> canonical column)
+COLUMN_ALIASES = {
+    'product_id': 'product_code',
+    'model': 'product_code',
+    'unit_price': 'price',
+    'qty': 'quantity'
+}
+
+def excel_engine() -> Optional[str]:
+    """
+    Fastest Excel reader available: the Rust-based calamine engine when
+    python-calamine is installed, otherwise pandas' default (openpyxl/xlrd).
+    """
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return None
+
+class UnsupportedFormatError(ValueError):
+    pass
+
+def upload_extension(filename: str) -> str:
+    """
+    Returns the (possibly compound) supported extension of filename,
+    e.g. ".csv.gz", or "" if the format is not supported.
+    """
+    name = filename.lower()
+    for ext in sorted(SUPPORTED_EXTENSIONS, key=len, reverse=True):
+        if name.endswith(ext):
+            return ext
+    return ""
+
+def base_name(filename: str) -> str:
+    """
+    File name without directory and without its upload extension:
+    "uploads/store_1.csv.gz" -> "store_1".
+    """
+    name = os.path.basename(filename)
+    ext = upload_extension(name)
+    return name[:-len(ext)] if ext else os.path.splitext(name)[0]
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Lower-cases and strips headers and maps aliases to canonical names
+    ("Model" -> "product_code"), in place. Store files combined into one
+    upload are normalized first so their columns line up.
+    """
+    df.columns = [COLUMN_ALIASES.get(c, c) for c in (str(c).lower().strip() for c in df.columns)]
+    return df
+
+def read_upload(source, filename: str = None, usecols: Union[List, Callable, None] = None) -> pd.DataFrame:
+    """
+    Parses an uploaded file into one DataFrame.
+
+    source is a path or a readable binary file object; filename (defaults
+    to the path) decides the format. Zip archives may hold several store
+    files; each supported member is streamed straight into the parser,
+    its headers normalized, and the results are concatenated with a
+    source_file column. Every sheet
+    of an Excel workbook is read and tagged in a sheet column.
+    usecols is passed to the parser to skip unneeded columns.
+    """
+    filename = filename or str(source)
+    ext = upload_extension(filename)
+    if not ext:
+        raise UnsupportedFormatError(f"Unsupported file format: {os.path.basename(filename)}")
+
+    if ext in CSV_COMPRESSION:
+        return pd.read_csv(source, compression=CSV_COMPRESSION[ext], usecols=usecols)
+    if ext in EXCEL_EXTENSIONS:
+        return read_excel_sheets(source, usecols=usecols)
+    return _read_zip(source, usecols)
+
+def read_excel_sheets(source, usecols=None) -> pd.DataFrame:
+    """
+    Reads all sheets of a workbook as one upload, in sheet order, with a
+    sheet column. The workbook is opened and parsed once; each sheet's
+    headers are normalized before the sheets are concatenated.
+    """
+    sheets = pd.read_excel(source, sheet_name=None, usecols=usecols, engine=excel_engine())
+
+    tagged = []
+    for name, df in sheets.items():
+        if df.empty and len(df.columns) == 0:
+            continue
+        normalize_columns(df)
+        df[SHEET_COLUMN] = name
+        tagged.append(df)
+    if not tagged:
+        return pd.DataFrame()
+    return pd.concat(tagged, ignore_index=True)
+
+def _read_zip(source, usecols=None) -> pd.DataFrame:
+    frames: List[pd.DataFrame] = []
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            member = info.filename
+            if info.is_dir() or member.startswith('__MACOSX/') or os.path.basename(member).startswith('.'):
+                continue
+            ext = upload_extension(member)
+            if not ext or ext in ARCHIVE_EXTENSIONS:
+                continue
+            with archive.open(info) as stream:
+                df = normalize_columns(read_upload(stream, member, usecols=usecols))
+            df[SOURCE_COLUMN] = member
+            frames.append(df)
+
+    if not frames:
+        raise UnsupportedFormatError("Archive contains no CSV/Excel files")
+    return pd.concat(frames, ignore_index=True)
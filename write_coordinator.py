@@ -0,0 +1,232 @@
+import sqlite3
+import threading
+import queue
+import logging
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Dict, List, Optional, Set
+
+from migrate_db import DB_FILE, BUSY_TIMEOUT_SECONDS
+
+# Configuration
+MAX_GROUP_JOBS = 16        # uploads merged into one commit
+MAX_GROUP_ROWS = 20000     # only small uploads are merged together
+MAX_CONFLICT_CODES = 50    # product codes listed per conflict report
+WRITE_TIMEOUT_SECONDS = 600
+
+class WriteFuture(Future):
+    """
+    Future returned by WriteCoordinator.submit. `conflicts` lists other
+    in-flight uploads that touched the same product codes at submit time.
+    """
+    def __init__(self):
+        super().__init__()
+        self.conflicts: List[Dict] = []
+
+    def wait(self, timeout: float = WRITE_TIMEOUT_SECONDS):
+        """
+        result() with a timeout. A job still queued when the timeout
+        expires is cancelled, so it never commits after the caller gave up.
+        """
+        try:
+            return self.result(timeout)
+        except TimeoutError:
+            if self.cancel():
+                raise TimeoutError(f"Write not started within {timeout}s; it was cancelled")
+            raise TimeoutError(f"Write still running after {timeout}s; it may yet commit")
+
+class _WriteJob:
+    def __init__(self, upload_id: str, product_codes: Set[str], work: Callable, size: int):
+        self.upload_id = upload_id
+        self.product_codes = product_codes
+        self.work = work
+        self.size = size
+        self.future = WriteFuture()
+
+class WriteCoordinator:
+    """
+    Serializes all writes to the database through a single writer thread.
+
+    Queued jobs are executed in submission order. Consecutive small jobs
+    whose product codes do not overlap are merged into one transaction
+    (group commit); each job runs inside its own SAVEPOINT so a failing
+    upload rolls back alone. Jobs touching the same product codes as an
+    in-flight job are never merged with it and get a conflict report.
+
+    on_commit, if set, is called on the writer thread once per committed
+    group, after the group's futures have been resolved.
+    """
+    def __init__(self, db_path=DB_FILE, max_group_jobs=MAX_GROUP_JOBS, max_group_rows=MAX_GROUP_ROWS,
+                 on_commit: Optional[Callable[[], None]] = None):
+        self.db_path = db_path
+        self.max_group_jobs = max_group_jobs
+        self.max_group_rows = max_group_rows
+        self.on_commit = on_commit
+
+        self._queue = queue.Queue()
+        self._held: Optional[_WriteJob] = None
+        self._in_flight: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="write-coordinator", daemon=True)
+        self._thread.start()
+
+    def submit(self, upload_id: str, product_codes: Set[str], work: Callable, size: int = 1) -> WriteFuture:
+        """
+        Queues work(conn) to run inside a write transaction.
+        Returns a future resolving to work's return value.
+        """
+        job = _WriteJob(upload_id, set(product_codes), work, size)
+
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("WriteCoordinator has been shut down")
+            for other_id, other_codes in self._in_flight.items():
+                overlap = job.product_codes & other_codes
+                if overlap:
+                    job.future.conflicts.append({
+                        "upload_id": other_id,
+                        "product_codes": sorted(overlap)[:MAX_CONFLICT_CODES]
+                    })
+            self._in_flight[upload_id] = job.product_codes
+            # Queued under the lock so it can never land behind shutdown's sentinel
+            self._queue.put(job)
+
+        if job.future.conflicts:
+            logging.warning(
+                f"Upload {upload_id} overlaps in-flight uploads: "
+                f"{[c['upload_id'] for c in job.future.conflicts]}"
+            )
+        return job.future
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if not self._stopped:
+                self._stopped = True
+                self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _next_group(self) -> Optional[List[_WriteJob]]:
+        first = self._held or self._queue.get()
+        self._held = None
+        if first is None:
+            return None
+
+        group = [first]
+        codes = set(first.product_codes)
+        rows = first.size
+
+        # Only small jobs are worth merging; a big upload commits alone.
+        while rows < self.max_group_rows and len(group) < self.max_group_jobs:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)
+                break
+            if rows + job.size > self.max_group_rows or codes & job.product_codes:
+                # Keep submission order: this job starts the next group.
+                self._held = job
+                break
+            group.append(job)
+            codes |= job.product_codes
+            rows += job.size
+        return group
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+        conn.isolation_level = None
+        # WAL lets readers (summary, lookups) proceed while we write.
+        conn.execute("PRAGMA journal_mode=WAL;")
+        return conn
+
+    def _run(self):
+        conn = None
+        try:
+            conn = self._connect()
+            while True:
+                group = self._next_group()
+                if group is None:
+                    break
+                self._commit_group(conn, group)
+        except Exception as e:
+            logging.error(f"Write coordinator stopped: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """
+        Called when the writer thread exits: refuses new jobs and fails
+        every job still queued so no caller waits on it forever.
+        """
+        with self._lock:
+            self._stopped = True
+            pending = [self._held] if self._held else []
+            self._held = None
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    pending.append(job)
+            for job in pending:
+                self._in_flight.pop(job.upload_id, None)
+        for job in pending:
+            if not job.future.cancelled():
+                job.future.set_exception(RuntimeError("WriteCoordinator has been shut down"))
+
+    def _commit_group(self, conn, group: List[_WriteJob]):
+        # Jobs cancelled by a timed-out caller are dropped before they run
+        cancelled = [job for job in group if not job.future.set_running_or_notify_cancel()]
+        if cancelled:
+            with self._lock:
+                for job in cancelled:
+                    self._in_flight.pop(job.upload_id, None)
+            group = [job for job in group if job not in cancelled]
+            if not group:
+                return
+
+        results = {}
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE;")
+            for i, job in enumerate(group):
+                cursor.execute(f"SAVEPOINT job_{i};")
+                try:
+                    results[i] = job.work(conn)
+                    cursor.execute(f"RELEASE job_{i};")
+                except Exception as e:
+                    cursor.execute(f"ROLLBACK TO job_{i};")
+                    cursor.execute(f"RELEASE job_{i};")
+                    results[i] = e
+            cursor.execute("COMMIT;")
+            if len(group) > 1:
+                logging.info(f"Group commit of {len(group)} uploads: {[j.upload_id for j in group]}")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logging.error(f"Group commit failed: {e}")
+            results = {i: e for i in range(len(group))}
+
+        with self._lock:
+            for job in group:
+                self._in_flight.pop(job.upload_id, None)
+
+        for i, job in enumerate(group):
+            result = results.get(i)
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+        committed = any(not isinstance(r, Exception) for r in results.values())
+        if committed and self.on_commit is not None:
+            try:
+                self.on_commit()
+            except Exception as e:
+                logging.error(f"on_commit hook failed: {e}")